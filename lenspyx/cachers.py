@@ -22,11 +22,21 @@ class cacher_none(cacher):
         pass
 
 class cacher_npy(cacher):
-    def __init__(self, lib_dir, verbose=False):
+    def __init__(self, lib_dir, verbose=False, mmap=False):
+        """Caches arrays to disk in numpy .npy format
+
+            Args:
+                lib_dir: directory where to store the arrays
+                verbose: prints some info if set
+                mmap: if set, loads returns read-only memory maps of the arrays on disk instead of copies in memory.
+                      Several processes may then share the same arrays through the page cache.
+
+        """
         if not os.path.exists(lib_dir):
-            os.makedirs(lib_dir)
+            os.makedirs(lib_dir, exist_ok=True)
         self.lib_dir = lib_dir
         self.verbose = verbose
+        self.mmap = mmap
 
     def _path(self, fn):
         assert '.npy' not in fn
@@ -34,15 +44,19 @@ class cacher_npy(cacher):
         return os.path.join(self.lib_dir, fn + '.npy')
 
     def cache(self, fn, obj):
-        np.save(self._path(fn), obj)
+        # writes to a temporary file first, such that other processes never see a partially written array
+        p = self._path(fn)
+        tmp = p[:-len('.npy')] + '.%s.tmp.npy'%os.getpid()
+        np.save(tmp, obj)
+        os.replace(tmp, p)
         if self.verbose: print("Cached " + fn + '.npy')
 
     def load(self, fn):
         p = self._path(fn)
         assert os.path.exists(p), p
         if self.verbose:
-            print("Loading " + fn + '.npy')
-        return np.load(p)
+            print("Loading " + fn + '.npy' + self.mmap * ' (mmap)')
+        return np.load(p, mmap_mode='r' if self.mmap else None)
 
     def is_cached(self, fn):
         return os.path.exists(self._path(fn))
@@ -52,6 +66,76 @@ class cacher_npy(cacher):
         os.remove(self._path(fn))
 
 
+class cacher_lru(cacher_npy):
+    def __init__(self, lib_dir, max_size=20 * 1024 ** 3, verbose=False, mmap=False):
+        """Caches arrays to disk in numpy .npy format, with a bound on the total size
+
+            Least recently cached or loaded arrays are removed to stay within the bound
+            (the array just cached is always kept). This can be shared by any number of processes.
+
+            Args:
+                lib_dir: directory where to store the arrays
+                max_size: bound on the total size of the arrays on disk in bytes
+                verbose: prints some info if set
+                mmap: if set, loads returns read-only memory maps of the arrays on disk instead of copies in memory
+
+        """
+        super().__init__(lib_dir, verbose=verbose, mmap=mmap)
+        self.max_size = max_size
+
+    def cache(self, fn, obj):
+        super().cache(fn, obj)
+        self._evict(keep=self._path(fn))
+
+    def load(self, fn):
+        p = self._path(fn)
+        if os.path.exists(p):
+            os.utime(p) # last access time for eviction
+        return super().load(fn)
+
+    def _evict(self, keep):
+        files = []
+        for f in os.listdir(self.lib_dir):
+            p = os.path.join(self.lib_dir, f)
+            if f.endswith('.npy') and not f.endswith('.tmp.npy') and p != keep:
+                try:
+                    st = os.stat(p)
+                except FileNotFoundError: # removed by another process
+                    continue
+                files.append((st.st_mtime, st.st_size, p))
+        size = sum(f[1] for f in files) + os.path.getsize(keep)
+        for mtime, nbytes, p in sorted(files):
+            if size <= self.max_size:
+                break
+            try:
+                os.remove(p)
+            except FileNotFoundError:
+                pass
+            size -= nbytes
+            if self.verbose: print("Evicted " + os.path.basename(p))
+
+
+class cacher_prefix(cacher):
+    def __init__(self, cacher:cacher, prefix:str):
+        """Caches through another cacher instance, prefixing all names, e.g. with a content hash
+
+        """
+        self.cacher = cacher
+        self.prefix = prefix
+
+    def cache(self, fn, obj):
+        self.cacher.cache(self.prefix + fn, obj)
+
+    def load(self, fn):
+        return self.cacher.load(self.prefix + fn)
+
+    def is_cached(self, fn):
+        return self.cacher.is_cached(self.prefix + fn)
+
+    def remove(self, fn):
+        self.cacher.remove(self.prefix + fn)
+
+
 class cacher_mem(cacher):
     def __init__(self, safe=True):
         """Makes copies if safe is set, otherwise returns and cache the reference
@@ -77,4 +161,61 @@ class cacher_mem(cacher):
 
     def remove(self, fn):
         assert fn in self._cache.keys()
-        del self._cache[fn]
\ No newline at end of file
+        del self._cache[fn]
+
+class plan_cache(object):
+    def __init__(self, max_memory=2 * 1024 ** 3, verbose=False):
+        """Least-recently-used store of objects with a memory budget, e.g. nuFFT plans
+
+            Args:
+                max_memory: memory budget in bytes. Least recently used objects are dropped to stay within it
+                            (the most recent object is always kept, even if alone above budget)
+                verbose: prints some info if set
+
+        """
+        from collections import OrderedDict
+        self.max_memory = max_memory
+        self.verbose = verbose
+        self._cache = OrderedDict()
+        self._nbytes = dict()
+        self.hits, self.misses, self.evictions = 0, 0, 0
+
+    def get(self, key, builder, nbytes:int):
+        """Returns the cached object, or the output of builder() after caching it
+
+            Args:
+                key: hashable key of the object
+                builder: argument-less function building the object
+                nbytes: (estimated) memory footprint of the object
+
+
+        """
+        if key in self._cache:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        self.misses += 1
+        obj = builder()
+        while len(self._cache) > 0 and self.memory() + nbytes > self.max_memory:
+            old_key, _ = self._cache.popitem(last=False)
+            del self._nbytes[old_key]
+            self.evictions += 1
+            if self.verbose:
+                print("plan_cache: evicted " + str(old_key))
+        self._cache[key] = obj
+        self._nbytes[key] = nbytes
+        return obj
+
+    def memory(self):
+        """Estimated memory footprint of the cached objects in bytes
+
+        """
+        return sum(self._nbytes.values())
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': len(self._cache), 'memory': self.memory()}
+
+    def clear(self):
+        self._cache.clear()
+        self._nbytes.clear()
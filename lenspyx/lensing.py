@@ -1,7 +1,7 @@
 from __future__ import print_function, annotations
 from os import cpu_count
 import numpy as np
-from lenspyx.remapping.utils_geom import Geom
+from lenspyx.remapping.utils_geom import Geom, cached_geometry
 from lenspyx.remapping.deflection_029 import deflection
 from lenspyx import cachers
 from lenspyx.utils_hp import almxfl, Alm
@@ -15,11 +15,17 @@ def get_geom(geometry: tuple[str, dict]=('healpix', {'nside':2048})):
         Note:
             Custom geometries can be defined following lenspyx.remapping.utils_geom.Geom
 
+        Note:
+            The returned instance is a private, writeable copy of the memoized geometry
+            (see utils_geom.cached_geometry for the shared, read-only instance)
+
     """
-    geo = getattr(Geom, '_'.join(['get', geometry[0], 'geometry']), None)
-    if geo is None:
-        assert 0, 'Geometry %s not found, available geometries: '%geometry[0] + Geom.get_supported_geometries()
-    return geo(**geometry[1])
+    g = _shared_geom(geometry)
+    return Geom(g.theta, g.phi0, g.nph, g.ofs, g.weight)
+
+
+def _shared_geom(geometry: tuple[str, dict]):
+    return cached_geometry(geometry[0], **geometry[1])
 
 
 def alm2lenmap(alm, dlms, geometry: tuple[str, dict]=('healpix', {'nside':2048}), epsilon=1e-7, verbose=0, nthreads: int=0, pol=True):
@@ -66,7 +72,7 @@ def alm2lenmap(alm, dlms, geometry: tuple[str, dict]=('healpix', {'nside':2048})
         dglm = dlms
         dclm = None
 
-    defl = deflection(get_geom(geometry), dglm, None, dclm=dclm, epsilon=epsilon, numthreads=nthreads, verbosity=0,
+    defl = deflection(_shared_geom(geometry), dglm, None, dclm=dclm, epsilon=epsilon, numthreads=nthreads, verbosity=0,
                       cacher=cachers.cacher_mem(safe=False))
     if isinstance(alm, list) or alm.ndim == 2:
         if pol and len(alm) in [2, 3]:
@@ -138,7 +144,7 @@ def alm2lenmap_spin(gclm: np.ndarray or list, dlms:np.ndarray or list, spin:int,
         if verbose:
             print('alm2lenmap_spin: using %s nthreads'%nthreads)
 
-    defl = deflection(get_geom(geometry), dglm, None, dclm=dclm, epsilon=epsilon, numthreads=nthreads, verbosity=0,
+    defl = deflection(_shared_geom(geometry), dglm, None, dclm=dclm, epsilon=epsilon, numthreads=nthreads, verbosity=0,
                       cacher=cachers.cacher_mem(safe=False))
     if isinstance(gclm, list) and gclm[1] is None:
         gclm = gclm[0]
@@ -270,7 +276,7 @@ def synfast(cls: dict, lmax=None, mmax=None, geometry=('healpix', {'nside': 2048
             dclm = np.zeros_like(dglm)
         if nthreads <= 0:
             nthreads = cpu_count()
-        defl = deflection(get_geom(geometry), dglm, None, dclm=dclm, epsilon=epsilon, numthreads=nthreads, verbosity=0,
+        defl = deflection(_shared_geom(geometry), dglm, None, dclm=dclm, epsilon=epsilon, numthreads=nthreads, verbosity=0,
                           cacher=cachers.cacher_mem(safe=False))
         if 't' in labels_wgrad:
             maps['T'] = defl.gclm2lenmap(alms[0:1], mmax, 0, False).squeeze()
@@ -284,7 +290,7 @@ def synfast(cls: dict, lmax=None, mmax=None, geometry=('healpix', {'nside': 2048
         almxfl(dglm, d2p, mmax, True)
         almxfl(dclm, d2p, mmax, True)
     else:  # no lensing here
-        geom = get_geom(geometry)
+        geom = _shared_geom(geometry)
         if 't' in labels_wgrad:
             maps['T'] = geom.synthesis(alms[0:1], 0, lmax, mmax, nthreads)
         if 'e' in labels_wgrad:
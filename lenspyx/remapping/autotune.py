@@ -0,0 +1,198 @@
+"""Runtime selection of the fastest remapping engine
+
+    The 028 (double Fourier sphere + NUFFT) and 029 (ducc synthesis_general) deflection engines perform the same
+    operations, but their relative speed depends on lmax, spin, accuracy, number of threads and hardware.
+    The deflection class of this module times short probe transforms on small bands of the instance geometry the first
+    time an operation is requested, and dispatches it to the engine with the shortest extrapolated time from then on.
+
+    Decisions are kept on disk in a small json file, so that they are only ever measured once per node type.
+
+
+"""
+from __future__ import annotations
+
+import os
+import json
+import hashlib
+import numpy as np
+from time import time
+from lenspyx.utils_hp import Alm
+from lenspyx import cachers
+from lenspyx.remapping import deflection_028, deflection_029
+from lenspyx.remapping.utils_geom import Geom
+
+engines = {'028': deflection_028.deflection, '029': deflection_029.deflection}
+
+
+def geom_hash(geom:Geom):
+    """Short hash of a pixelization geometry, sensitive to the rings positions and pixels layout only
+
+    """
+    h = hashlib.sha1()
+    for arr in [geom.theta, geom.phi0, geom.nph, geom.ofs]:
+        h.update(np.ascontiguousarray(arr).tobytes())
+    return h.hexdigest()[:16]
+
+
+class engine_cache:
+    def __init__(self, fn:str or None=None):
+        """Disk storage of the engine decisions, as a json dictionary
+
+            Args:
+                fn: path to the json file. Defaults to $LENSPYX_AUTOTUNE_CACHE if set, ~/.cache/lenspyx/autotune.json otherwise
+
+
+        """
+        if fn is None:
+            fn = os.environ.get('LENSPYX_AUTOTUNE_CACHE',
+                                os.path.join(os.path.expanduser('~'), '.cache', 'lenspyx', 'autotune.json'))
+        self.fn = fn
+
+    def _load(self):
+        if not os.path.exists(self.fn):
+            return {}
+        try:
+            with open(self.fn, 'r') as f:
+                return json.load(f)
+        except (ValueError, OSError):  # corrupted or unreadable file, will be overwritten
+            return {}
+
+    def get(self, key:str):
+        return self._load().get(key, None)
+
+    def set(self, key:str, engine:str):
+        decisions = self._load()
+        decisions[key] = engine
+        os.makedirs(os.path.dirname(os.path.abspath(self.fn)), exist_ok=True)
+        tmp = self.fn + '.%s.tmp'%os.getpid()
+        with open(tmp, 'w') as f:
+            json.dump(decisions, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.fn)
+
+
+class deflection(deflection_029.deflection):
+    def __init__(self, *args, tune_cache:engine_cache or None=None, nprobes:int=1, probe_frac:float=1. / 32, **kwargs):
+        """Deflection instance dispatching each remapping operation to the fastest of the 028 and 029 engines
+
+            Args:
+                args, kwargs: as deflection_029.deflection
+                tune_cache: engine decisions disk storage (defaults to engine_cache())
+                nprobes: number of timed probe transforms per engine and probe band (the best time is kept)
+                probe_frac: fraction of the instance pixels in the smallest probe band
+
+
+        """
+        super().__init__(*args, **kwargs)
+        self.tune_cache = engine_cache() if tune_cache is None else tune_cache
+        self.nprobes = nprobes
+        self.probe_frac = probe_frac
+        self._engines = {}
+
+    def _tune_key(self, op:str, lmax:int, spin:int):
+        fp = 'fullsky' if self._fp_pix is None else 'fp' + hashlib.sha1(self._fp_pix.tobytes()).hexdigest()[:16]
+        return '_'.join([op, geom_hash(self.geom), fp, 'l%s'%lmax, 's%s'%spin, 'eps%.1e'%self.epsilon,
+                         'nt%s'%self.sht_tr, 'fp32' if self.single_prec else 'fp64', 'planned' * self.planned])
+
+    def best_engine(self, op:str, lmax:int, spin:int):
+        """Returns the fastest engine ('028' or '029') for the operation ('gclm2lenmap' or 'lenmap2gclm')
+
+            The decision is looked up in memory, then on disk, and otherwise measured with probe transforms
+
+
+        """
+        assert op in ['gclm2lenmap', 'lenmap2gclm'], op
+        key = self._tune_key(op, lmax, spin)
+        if key not in self._engines:
+            engine = self.tune_cache.get(key)
+            if engine not in engines:
+                engine = self._probe(op, lmax, spin)
+                self.tune_cache.set(key, engine)
+            self._engines[key] = engine
+        return self._engines[key]
+
+    def _probe_geom(self, npix:int):
+        """Geometry made of the rings closest to the equator, with at least npix pixels (or all rings)
+
+        """
+        geom = self.geom
+        rings = np.argsort(np.abs(geom.theta - 0.5 * np.pi), kind='stable')
+        nrings = min(int(np.searchsorted(np.cumsum(geom.nph[rings]), npix)) + 1, rings.size)
+        rings = np.sort(rings[:nrings])
+        nph = geom.nph[rings]
+        return Geom(geom.theta[rings], geom.phi0[rings], nph, np.insert(np.cumsum(nph)[:-1], 0, 0), geom.weight[rings])
+
+    def _probe(self, op:str, lmax:int, spin:int):
+        """Times each engine with random inputs on two small bands of the instance geometry, and returns the engine
+            with the shortest time extrapolated to the instance number of points
+
+            The times are modelled as a constant (the uniform part of the transforms, independent of the number of
+            points) plus a term proportional to the number of points. The pointing and nuFFT plans of the probe bands
+            are built beforehand, and each engine is run once before the timings, such that none is timed cold
+
+        """
+        npts = self.geom.npix() if self._fp_pix is None else self._fp_pix.size
+        rng = np.random.default_rng(lmax + spin)
+        ncomp = 1 if spin == 0 else 2
+        gclm = rng.standard_normal((ncomp, Alm.getsize(lmax, lmax)), dtype=np.float64) + 0j
+        gclm = gclm.astype(np.complex64 if self.single_prec else np.complex128)
+        times, npixs = {name: [] for name in engines}, []
+        for ib, frac in enumerate([self.probe_frac, 2 * self.probe_frac]):
+            pgeom = self._probe_geom(int(frac * npts))
+            if ib > 0 and pgeom.npix() == npixs[-1]: # (too few rings for a second band)
+                break
+            pffi = deflection_029.deflection(pgeom, self.dlm, self.mmax_dlm, self.sht_tr, cachers.cacher_mem(safe=False),
+                                             self.dclm, epsilon=self.epsilon, single_prec=self.single_prec,
+                                             planned=self.planned)
+            pffi._get_ptg()
+            if self.planned:
+                pffi.make_plan(lmax, spin)
+            npixs.append(pgeom.npix())
+            if op == 'gclm2lenmap':
+                run = lambda engine: engine.gclm2lenmap(pffi, gclm, lmax, spin, False)
+            else:
+                m = rng.standard_normal((ncomp, pgeom.npix()), dtype=np.float64)
+                m = m.astype(np.float32 if self.single_prec else np.float64)
+                run = lambda engine: engine.lenmap2gclm(pffi, m.copy(), spin, lmax, lmax)
+            if ib == 0:
+                for engine in engines.values():
+                    run(engine)
+            for name in times:
+                times[name].append(np.inf)
+            for i in range(self.nprobes):
+                for name, engine in engines.items():
+                    t0 = time()
+                    run(engine)
+                    times[name][-1] = min(times[name][-1], time() - t0)
+        est = {}
+        for name, ts in times.items():
+            slope = max(ts[-1] - ts[0], 0.) / (npixs[-1] - npixs[0]) if len(ts) > 1 else 0.
+            est[name] = ts[-1] + slope * (npts - npixs[-1])
+        best = min(est, key=est.get)
+        if self.verbosity:
+            print('autotune %s lmax %s spin %s, estimated times for %s points: '%(op, lmax, spin, npts)
+                  + ', '.join(['%s %.3fs'%(name, t) for name, t in est.items()]) + ' -> ' + best)
+        return best
+
+    def gclm2lenmap(self, gclm:np.ndarray, mmax:int or None, spin:int, backwards:bool, polrot=True, ptg=None):
+        lmax = Alm.getlmax(np.atleast_2d(gclm)[0].size, mmax)
+        engine = engines[self.best_engine('gclm2lenmap', lmax, spin)]
+        # (the 028 engine returns one-dimensional spin-0 maps, the output here follows the 029 engine)
+        return np.atleast_2d(engine.gclm2lenmap(self, gclm, mmax, spin, backwards, polrot=polrot, ptg=ptg))
+
+    def lenmap2gclm(self, points:np.ndarray[complex or float], spin:int, lmax:int, mmax:int, gclm_out=None,
+                    sht_mode='STANDARD'):
+        if np.iscomplexobj(points) or points.ndim != 2:
+            engine = engines['028'] # only the 028 engine accepts these inputs
+        else:
+            engine = engines[self.best_engine('lenmap2gclm', lmax, spin)]
+        return engine.lenmap2gclm(self, points, spin, lmax, mmax, gclm_out=gclm_out, sht_mode=sht_mode)
+
+    def change_dlm(self, dlm:list or np.ndarray, mmax_dlm:int or None, cacher=None):
+        assert len(dlm) == 2, (len(dlm), 'gradient and curl mode (curl can be none)')
+        ret = deflection(self.geom, dlm[0], mmax_dlm, self.sht_tr, cacher, dlm[1],
+                         verbosity=self.verbosity, epsilon=self.epsilon, single_prec=self.single_prec,
+                         ptg_format=self.ptg_format, planned=self.planned, plan_cache=self.plan_cache,
+                         footprint=self.footprint, max_memory=self.max_memory,
+                         ptg_cache=self.ptg_cache if cacher is None else None, tune_cache=self.tune_cache, nprobes=self.nprobes, probe_frac=self.probe_frac)
+        ret._engines = self._engines # same geometry, same decisions
+        return ret
@@ -1,15 +1,19 @@
 from __future__ import annotations
 
 import os
+import copy
+import hashlib
 import numpy as np
 import ducc0
 
-from lenspyx.remapping.utils_angles import d2ang
+from lenspyx.remapping.utils_angles import d2ang_gamma
 from lenspyx.utils_hp import Alm, alm2cl, almxfl, alm_copy
 from lenspyx import cachers
 from lenspyx.utils import timer, blm_gauss
 from lenspyx.remapping.utils_geom import Geom, pbdGeometry, pbounds
+from ducc0.sht.experimental import synthesis_general
 from multiprocessing import cpu_count
+from concurrent.futures import ThreadPoolExecutor
 try:
     from lenspyx.fortran.remapping import remapping as fremap
     HAS_FORTRAN = True
@@ -20,6 +24,12 @@ HAS_DUCCPOINTING = 'get_deflected_angles' in ducc0.misc.__dict__
 HAS_DUCCROTATE = 'lensing_rotate' in ducc0.misc.__dict__
 HAS_DUCCGRADONLY = 'mode:' in ducc0.sht.experimental.synthesis.__doc__
 
+try:
+    import numexpr
+    HAS_NUMEXPR = True
+except:
+    HAS_NUMEXPR = False
+
 if HAS_DUCCPOINTING:
     from ducc0.misc import get_deflected_angles
 if HAS_DUCCROTATE:
@@ -42,15 +52,129 @@ rtype = {np.dtype(np.complex64): np.float32,
          np.complex128: np.float64,
          np.longdouble: np.longdouble}
 
+# The single precision pointing offsets are accurate to ~1e-10 radians for CMB-like deflections, limiting the relative
+# accuracy of the remapped fields to ~1e-11 lmax. Smaller epsilon values fall back to double precision absolute angles
+offset32_epsilon_min = 1e-6
+
+def memory_budget(max_memory:float or str or None=None):
+    """Memory budget in bytes, from the argument or else from the LENSPYX_MAX_MEMORY environment variable
+
+        Args:
+            max_memory: number of bytes, or string such as '16GB', '500MB' or '8e9'
+
+        Returns:
+            budget in bytes, or None if there is none
+
+    """
+    if max_memory is None:
+        max_memory = os.environ.get('LENSPYX_MAX_MEMORY', None)
+    if max_memory is None or max_memory == '':
+        return None
+    if isinstance(max_memory, str):
+        units = {'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3, 'TB': 1024 ** 4}
+        mem = max_memory.strip().upper()
+        fac = 1
+        if mem[-2:] in units:
+            mem, fac = mem[:-2], units[mem[-2:]]
+        max_memory = float(mem) * fac
+    assert max_memory > 0, max_memory
+    return float(max_memory)
+
 def ducc_sht_mode(gclm, spin):
 
     gclm_ = np.atleast_2d(gclm)
     return 'GRAD_ONLY' if ((gclm_[0].size == gclm_.size) * (abs(spin) > 0)) else 'STANDARD'
 
+def gclm2dfs(gclm:np.ndarray, lmax:int, mmax:int or None, spin:int, nthreads:int, out:np.ndarray=None, tim:timer=None):
+    """Builds the Fourier coefficients of the double Fourier sphere extension of a field
+
+        Args:
+            gclm: input alm array, shape (ncomp, nalm), where ncomp can be 1 (gradient-only) or 2 (gradient or curl)
+            lmax: lmax of the alm array
+            mmax: mmax parameter of alm array layout, if different from lmax
+            spin: spin (>=0) of the field
+            nthreads: number of threads for the SHT and FFT
+            out(optional): complex output array of shape (2 * ntheta - 2, nphi)
+            tim(optional): timer instance to report to
+
+        Returns:
+            complex array of shape (2 * ntheta - 2, nphi), with ntheta and nphi good FFT sizes for lmax + 2 and
+            2 * (lmax + 1) respectively, in 'fft_order'
+
+        Note:
+            This depends only on the undeflected field, and is the input of the uniform-to-nonuniform transforms
+
+    """
+    gclm = np.atleast_2d(gclm)
+    if mmax is None:
+        mmax = lmax
+    ntheta = ducc0.fft.good_size(lmax + 2)
+    nphihalf = ducc0.fft.good_size(lmax + 1)
+    nphi = 2 * nphihalf
+    # NB: type of map, map_df, and FFTs will follow that of input gclm
+    mode = ducc_sht_mode(gclm, spin)
+    map = ducc0.sht.experimental.synthesis_2d(alm=gclm, ntheta=ntheta, nphi=nphi,
+                            spin=spin, lmax=lmax, mmax=mmax, geometry="CC", nthreads=nthreads, mode=mode)
+    if tim is not None:
+        tim.add('experimental.synthesis_2d (%s)'%mode)
+    # extend map to double Fourier sphere map
+    if out is None:
+        out = np.empty((2 * ntheta - 2, nphi), dtype=ctype[map.dtype])
+    assert out.shape == (2 * ntheta - 2, nphi), (out.shape, (2 * ntheta - 2, nphi))
+    map_dfs = out
+    if spin == 0:
+        map_dfs[:ntheta, :] = map[0]
+    else:
+        map_dfs[:ntheta, :].real = map[0]
+        map_dfs[:ntheta, :].imag = map[1]
+    del map
+
+    map_dfs[ntheta:, :nphihalf] = map_dfs[ntheta - 2:0:-1, nphihalf:]
+    map_dfs[ntheta:, nphihalf:] = map_dfs[ntheta - 2:0:-1, :nphihalf]
+    if (spin % 2) != 0:
+        map_dfs[ntheta:, :] *= -1
+    if tim is not None:
+        tim.add('map_dfs build')
+
+    # go to Fourier space
+    map_dfs = ducc0.fft.c2c(map_dfs, axes=(0, 1), inorm=2, nthreads=nthreads, out=map_dfs)
+    if tim is not None:
+        tim.add('map_dfs 2DFFT')
+    return map_dfs
+
+
+class dfsgrid:
+    def __init__(self, gclm:np.ndarray, mmax:int or None, spin:int, nthreads:int=0):
+        """Fourier-space double Fourier sphere grid of an undeflected field
+
+            This depends only on the undeflected field, and can be lensed by any number of deflection instances
+            with their 'dfs2lenmap' method, skipping each time the SHT and 2D FFT of 'gclm2lenmap'.
+
+            Args:
+                gclm: input alm array, shape (ncomp, nalm), where ncomp can be 1 (gradient-only) or 2 (gradient or curl)
+                mmax: mmax parameter of alm array layout, if different from lmax
+                spin: spin (>=0) of the field
+                nthreads: number of threads for the SHT and FFT (uses all available by default)
+
+            Note:
+                The grid precision follows that of gclm
+
+        """
+        gclm = np.atleast_2d(gclm)
+        self.lmax = Alm.getlmax(gclm[0].size, mmax)
+        self.mmax = self.lmax if mmax is None else mmax
+        self.spin = spin
+        self.grid = gclm2dfs(gclm, self.lmax, self.mmax, spin, nthreads if nthreads > 0 else cpu_count())
+
+
 class deflection:
+    _supports_streaming = False # lensgclm_streamed, hence the latitude bands options of plan_memory
+
     def __init__(self, lens_geom:Geom, dglm, mmax_dlm:int or None, numthreads:int=0,
                  cacher:cachers.cacher or None=None, dclm:np.ndarray or None=None,
-                 epsilon=1e-5, verbosity=0, single_prec=True, planned=False):
+                 epsilon=1e-5, verbosity=0, single_prec=True, planned=False, ptg_format='abs64',
+                 plan_cache:cachers.plan_cache or None=None, footprint:np.ndarray or pbdGeometry or None=None,
+                 max_memory:float or str or None=None, ptg_cache:cachers.cacher or None=None):
         """Deflection field object than can be used to lens several maps with forward or backward deflection
 
             Args:
@@ -62,12 +186,44 @@ class deflection:
                 dclm: deflection-field alm array, curl mode (if relevant)
                 mmax_dlm: maximal m of the dlm / dclm arrays, if different from lmax
                 epsilon: desired accuracy on remapping
+                ptg_format(optional): storage format of the cached pointing.
+                                      'abs64': absolute deflected angles in double precision (default)
+                                      'offset32': offsets to the undeflected angles in single precision, halving the
+                                                  memory footprint. The absolute angles are rebuilt before each transform
+                                                  (positions are then accurate to ~1e-10 radians, for CMB-like deflections).
+                                                  This is not lossless, and is only used for epsilon values above
+                                                  offset32_epsilon_min (1e-6), 'abs64' being used otherwise
+                planned(optional): uses nuFFT plans, slightly faster if many remapping operations are performed
+                plan_cache(optional): cachers.plan_cache instance holding the nuFFT plans.
+                                      It is passed on by change_dlm, so that plans are kept under a single memory budget
+                footprint(optional): observed pixels, as a boolean array on the geometry or a pbdGeometry instance
+                                     (longitude cut, or mask with utils_geom.mskGeometry). Pointing, interpolation and rotations are then restricted to the
+                                     footprint; deflected maps are zero outside of it, and lenmap2gclm accepts either
+                                     full maps or footprint pixels values
+                max_memory(optional): memory budget in bytes (or string such as '16GB'), defaults to the
+                                      LENSPYX_MAX_MEMORY environment variable if set. The precision, nuFFT planning,
+                                      caching of the rotation angles and magnification, and latitude band splitting of
+                                      lensgclm are then chosen to fit the budget (see plan_memory).
+                                      The constructor fails right away if this is not possible
+                ptg_cache(optional): persistent cacher instance shared by all deflections, e.g. cachers.cacher_lru.
+                                     The pointing products are then stored and looked up under the content hash of
+                                     the deflection (see ptg_hash), such that any instance built from identical inputs
+                                     reuses them, in this process or any other. Defaults to a cachers.cacher_lru
+                                     instance in the $LENSPYX_PTG_CACHE directory if set and no cacher is given.
+                                     Cannot be combined with the cacher argument
 
 
         """
+        assert ptg_format in ['abs64', 'offset32'], ptg_format
+        assert cacher is None or ptg_cache is None, 'cacher and ptg_cache arguments are exclusive'
+        if ptg_format == 'offset32' and epsilon < offset32_epsilon_min:
+            if verbosity:
+                print('deflection: offset32 pointing too coarse for epsilon %.1e, using abs64'%epsilon)
+            ptg_format = 'abs64'
         lmax = Alm.getlmax(dglm.size, mmax_dlm)
         if mmax_dlm is None:
             mmax_dlm = lmax
+        default_cacher = cacher is None
         if cacher is None:
             cacher = cachers.cacher_mem(safe=False)
         if numthreads <= 0:
@@ -95,6 +251,18 @@ class deflection:
         self.cacher = cacher
         self.geom = lens_geom
         self.pbgeom = pbdGeometry(lens_geom, pbounds(0., 2 * np.pi))
+        self.footprint = footprint
+        self._fp_pix = None
+        if footprint is not None:
+            if isinstance(footprint, pbdGeometry):
+                assert footprint.geom.npix() == lens_geom.npix(), (footprint.geom.npix(), lens_geom.npix())
+                self.pbgeom = footprint
+                self._fp_pix = footprint.pixels()
+            else:
+                assert footprint.dtype == bool and footprint.size == lens_geom.npix(), (footprint.dtype, footprint.size)
+                self._fp_pix = np.flatnonzero(footprint)
+            assert ptg_format == 'abs64', 'offset pointing format not implemented with footprint'
+            self._fp_rgeom, self._fp_ridx, self._fp_pgeom = self._footprint_geoms()
 
         if verbosity:
             print("deflection: I set numthreads to " + str(numthreads))
@@ -105,10 +273,12 @@ class deflection:
 
         self.single_prec = single_prec * (epsilon > 1e-6) # Uses single precision arithmetic in some places
         self.single_prec_ptg = False
+        self.ptg_format = ptg_format
         self.tim = timer(False, 'deflection instance timer')
 
         self.planned = planned
-        self.plans = {}
+        self.plan_cache = cachers.plan_cache(verbose=verbosity) if plan_cache is None else plan_cache
+        self._ptg_key = None
 
         if verbosity:
             print(" DUCC %s threads deflection instantiated"%self.sht_tr + self.single_prec * '(single prec)', self.epsilon)
@@ -117,20 +287,168 @@ class deflection:
 
         self._cis = False
 
+        self.cache_gamma = True # rotation angles and magnification are cached, or recomputed on each call
+        self.cache_magn = True
+        self.nbands = 1 # number of latitude bands of lensgclm, with pointing built band per band and never cached
+        self.max_memory = memory_budget(max_memory)
+        self.mem_plan = None
+        self._plan_defaults = (self.single_prec, self.planned)
+        if self.max_memory is not None:
+            self.plan_memory(self.max_memory)
+
+        if ptg_cache is None and default_cacher and os.environ.get('LENSPYX_PTG_CACHE', ''):
+            ptg_cache = cachers.cacher_lru(os.environ['LENSPYX_PTG_CACHE'])
+        self.ptg_cache = ptg_cache
+        if ptg_cache is not None:
+            self.cacher = cachers.cacher_prefix(ptg_cache, self.ptg_hash() + '_')
+
+    def ptg_hash(self):
+        """Hash of the deflection content and settings that determine the pointing products
+
+            This covers the deflection alm, the geometry rings, the footprint, the pointing format and precision.
+            The accuracy parameter and number of threads do not affect the pointing
+
+        """
+        if self._ptg_key is None:
+            h = hashlib.sha1()
+            for arr in [self.geom.theta, self.geom.phi0, self.geom.nph, self.geom.ofs, self.dlm] \
+                       + [self.dclm] * (self.dclm is not None) + [self._fp_pix] * (self._fp_pix is not None):
+                h.update(np.ascontiguousarray(arr).tobytes())
+            h.update(('%s_%s_%s'%(self.mmax_dlm, self.ptg_format, 'fp32' if self.single_prec else 'fp64')).encode())
+            self._ptg_key = h.hexdigest()
+        return self._ptg_key
+
+    def memory_estimate(self, lmax:int, spin:int, single_prec:bool or None=None, planned:bool or None=None,
+                        cache_gamma:bool or None=None, cache_magn:bool or None=None, nbands:int or None=None):
+        """Rough estimate of the memory footprint of the lensing operations of this instance
+
+            Args:
+                lmax: band-limit of the lensed fields
+                spin: spin-weight of the lensed fields
+                single_prec, planned, cache_gamma, cache_magn, nbands(optional): settings to use instead of the
+                                                                                 instance ones
+
+            Returns:
+                dictionary with 'resident' (cached arrays), 'transient' (largest operation) and 'peak' numbers of bytes
+
+            Note:
+                Only the position-space arrays, alm arrays and uniform grids of the non-uniform transforms are counted,
+                not the interpreter and libraries overheads
+
+        """
+        single_prec = self.single_prec if single_prec is None else single_prec
+        planned = self.planned if planned is None else planned
+        cache_gamma = self.cache_gamma if cache_gamma is None else cache_gamma
+        cache_magn = self.cache_magn if cache_magn is None else cache_magn
+        nbands = self.nbands if nbands is None else nbands
+        npix = self.geom.npix()
+        npix_p = npix if self._fp_pix is None else self._fp_pix.size # pixels with pointing
+        rsize = 4 if single_prec else 8
+        ncomp = 1 + (spin != 0)
+        fixed = self._transform_bytes(lmax, spin, single_prec)
+        if nbands > 1:
+            band = npix * self._band_bytes_per_pix(spin, single_prec=single_prec) // nbands
+            return {'resident': 0, 'transient': fixed + band, 'peak': fixed + band}
+        offset = self.ptg_format == 'offset32'
+        resident = npix_p * (8 if offset else 16) + cache_gamma * npix_p * rsize + cache_magn * npix * 8 \
+                   + planned * npix_p * 24
+        build = npix * 16 + npix_p * (24 + rsize) # deflection synthesis and pointing output
+        magn = npix * 56 # shear, convergence and deflection
+        maps = ncomp * rsize * (npix + npix_p) # remapped values, and their copy on the full map or the footprint
+        recompute = max((not cache_gamma) * build, (not cache_magn) * magn)
+        transient = max(build, magn, maps + max(fixed + offset * npix_p * 16, recompute))
+        return {'resident': resident, 'transient': transient, 'peak': resident + transient}
+
+    @staticmethod
+    def _transform_bytes(lmax:int, spin:int, single_prec:bool):
+        """Rough estimate of the number of bytes of a non-uniform transform not depending on the number of points
+
+            (double Fourier sphere grid, upsampled by the nuFFT, and input and output alm)
+
+        """
+        csize = 8 if single_prec else 16
+        ntheta, nphi = ducc0.fft.good_size(lmax + 2), 2 * ducc0.fft.good_size(lmax + 1)
+        return 2 * (2 * ntheta - 2) * nphi * csize + 2 * (1 + (spin != 0)) * Alm.getsize(lmax, lmax) * csize
+
+    def plan_memory(self, max_memory:float, lmax:int or None=None, spin:int=2):
+        """Chooses the instance settings for its lensing operations to fit in a memory budget
+
+            The options are tried in this order, until the estimated peak footprint fits the budget:
+            no nuFFT plans, rotation angles and magnification recomputed on each call instead of cached,
+            single precision (only if epsilon is larger than 1e-6), and last, lensgclm processing the sky in
+            latitude bands, with the pointing built band per band and never cached (engines with lensgclm_streamed only,
+            and not with a footprint)
+
+            Args:
+                max_memory: memory budget in bytes
+                lmax: band-limit of the lensed fields (defaults to that of the deflection)
+                spin: spin-weight of the lensed fields
+
+            Returns:
+                dictionary with the chosen settings and estimated footprints, also stored as the mem_plan attribute
+
+        """
+        lmax = self.lmax_dlm if lmax is None else lmax
+        single_prec, planned = self._plan_defaults
+        candidates = [dict(single_prec=single_prec, planned=planned, cache_gamma=True, cache_magn=True, nbands=1)]
+        candidates.append(dict(candidates[-1], planned=False))
+        candidates.append(dict(candidates[-1], cache_gamma=False, cache_magn=False))
+        if self.epsilon > 1e-6:
+            candidates.append(dict(candidates[-1], single_prec=True))
+        if self._fp_pix is None and self._supports_streaming:
+            sp = candidates[-1]['single_prec']
+            band_memory = max_memory - self._transform_bytes(lmax, spin, sp) # for the position-space arrays of a band
+            if band_memory > 0:
+                nbands = int(np.ceil(self.geom.npix() * self._band_bytes_per_pix(spin, sp) / band_memory))
+                if 1 < nbands <= self.geom.theta.size // 2:
+                    candidates.append(dict(candidates[-1], nbands=nbands, band_memory=band_memory))
+        for cand in candidates:
+            est = self.memory_estimate(lmax, spin, **{k: v for k, v in cand.items() if k != 'band_memory'})
+            if est['peak'] <= max_memory:
+                break
+        assert est['peak'] <= max_memory, 'cannot fit in %.3g GB, smallest estimated peak is %.3g GB'%(max_memory / 1024 ** 3, est['peak'] / 1024 ** 3) \
+                                          + ' (no latitude bands with this engine)' * (not self._supports_streaming)
+        self.single_prec, self.planned = cand['single_prec'], cand['planned']
+        self.cache_gamma, self.cache_magn, self.nbands = cand['cache_gamma'], cand['cache_magn'], cand['nbands']
+        self.mem_plan = dict(cand, lmax=lmax, spin=spin, max_memory=max_memory, **est)
+        if self.verbosity:
+            print('deflection memory plan for lmax %s spin %s: '%(lmax, spin)
+                  + ', '.join(['%s %s'%(k, cand[k]) for k in ['single_prec', 'planned', 'cache_gamma', 'cache_magn', 'nbands']])
+                  + ', estimated peak %.2f GB (%.2f GB budget)'%(est['peak'] / 1024 ** 3, max_memory / 1024 ** 3))
+        return self.mem_plan
+
     def _get_ptg(self):
+        """Returns the (npix, 2) deflected co-latitudes and longitudes
+
+            Note:
+                This may be a read-only memory map (e.g. with cachers.cacher_npy(lib_dir, mmap=True)),
+                which is passed as is to the transforms, without copy
+
+        """
         # TODO improve this and fwd angles, e.g. this is computed twice for gamma if no cacher
         self._build_angles() if not self._cis else self._build_angleseig()
+        if self.ptg_format == 'offset32':
+            return self._offsets2ptg(self.cacher.load('dptg'))
         return self.cacher.load('ptg')
 
     def _get_gamma(self):
+        """Returns the (npix, ) rotation angles of the spin-weighted fields (possibly a read-only memory map)
+
+        """
+        if not self.cache_gamma and not self._cis:
+            return self._compute_angles(calc_rotation=True)[1]
         self._build_angles() if not self._cis else self._build_angleseig()
         return self.cacher.load('gamma')
 
-    def _build_d1(self):
+    def _build_d1(self, geom:Geom=None):
+        """Spin-1 deflection field synthesis, on the instance geometry or any other one (e.g. a latitude band)
+
+        """
+        geom = self.geom if geom is None else geom
         if self.dclm is None:
             # undo p2d to use
             self.tim.reset()
-            d1 = self.geom.synthesis(self.dlm, 1, self.lmax_dlm, self.mmax_dlm, self.sht_tr, mode='GRAD_ONLY')
+            d1 = geom.synthesis(self.dlm, 1, self.lmax_dlm, self.mmax_dlm, self.sht_tr, mode='GRAD_ONLY')
             self.tim.add('build angles <- synthesis (GRAD_ONLY)')
         else:
             # FIXME: want to do that only once
@@ -138,86 +456,189 @@ class deflection:
             dgclm = np.empty((2, self.dlm.size), dtype=self.dlm.dtype)
             dgclm[0] = self.dlm
             dgclm[1] = self.dclm
-            d1 = self.geom.synthesis(dgclm, 1, self.lmax_dlm, self.mmax_dlm, self.sht_tr)
+            d1 = geom.synthesis(dgclm, 1, self.lmax_dlm, self.mmax_dlm, self.sht_tr)
             self.tim.add('build angles <- synthesis (STANDARD)')
         return d1
 
     def _build_angles(self, fortran=True, calc_rotation=True):
         """Builds deflected positions and angles
 
-            Returns (npix, 3) array with new tht, phi and -gamma
+            Caches (npix, 2) array with new tht, phi and array of -gamma
 
         """
-        fns = ['ptg'] + calc_rotation * ['gamma']
+        calc_rotation = calc_rotation and self.cache_gamma
+        fns = ['dptg' if self.ptg_format == 'offset32' else 'ptg'] + calc_rotation * ['gamma']
         if not np.all([self.cacher.is_cached(fn) for fn in fns]) :
-            self.tim.start('build_angles')
+            self._cache_angles(*self._compute_angles(fortran=fortran, calc_rotation=calc_rotation))
+
+    def _compute_angles(self, fortran=True, calc_rotation=True):
+        """Deflected positions and angles on the instance geometry or footprint, without caching
+
+        """
+        self.tim.start('build_angles')
+        if self._fp_pix is None:
             d1 = self._build_d1()
-            # Probably want to keep red, imd double precision for the calc?
-            if HAS_DUCCPOINTING:
-                tht, phi0, nph, ofs = self.geom.theta, self.geom.phi0, self.geom.nph, self.geom.ofs
-                tht_phip_gamma = get_deflected_angles(theta=tht, phi0=phi0, nphi=nph, ringstart=ofs, deflect=d1.T,
-                                                      calc_rotation=calc_rotation, nthreads=self.sht_tr)
-                self.tim.add('build angles <- th-phi%s (ducc)'%('-gm'*calc_rotation))
-                if calc_rotation:
-                    self.cacher.cache(fns[0], tht_phip_gamma[:, 0:2])
-                    self.cacher.cache(fns[1], tht_phip_gamma[:, 2] if not self.single_prec else tht_phip_gamma[:, 2].astype(np.float32))
-                else:
-                    self.cacher.cache(fns[0], tht_phip_gamma)
-                self.tim.close('build_angles')
-                return
-            npix = Geom.npix(self.geom)
-            if fortran and HAS_FORTRAN:
-                red, imd = d1
-                tht, phi0, nph, ofs = self.geom.theta, self.geom.phi0, self.geom.nph, self.geom.ofs
-                if self.single_prec_ptg:
-                    thp_phip_gamma = fremap.fpointing(red, imd, tht, phi0, nph, ofs, self.sht_tr)
-                else:
-                    thp_phip_gamma = fremap.pointing(red, imd, tht, phi0, nph, ofs, self.sht_tr)
-                self.tim.add('build angles <- th-phi-gm (ftn)')
-                # I think this just trivially turns the F-array into a C-contiguous array:
-                self.cacher.cache(fns[0], thp_phip_gamma.transpose()[:, 0:2])
-                if calc_rotation:
-                    self.cacher.cache(fns[1], thp_phip_gamma.transpose()[:, 2] if not self.single_prec else thp_phip_gamma.transpose()[:, 2].astype(np.float32))
-                self.tim.close('build_angles')
-                if self.verbosity:
-                    print(self.tim)
-                return
-            elif fortran and not HAS_FORTRAN:
-                print('Cant use fortran pointing building since import failed. Falling back on python impl.')
-            thp_phip_gamma = np.empty((3, npix), dtype=float)  # (-1) gamma in last arguement
-            startpix = 0
-            assert np.all(self.geom.theta > 0.) and np.all(self.geom.theta < np.pi), 'fix this (cotangent below)'
+            ptg, gamma = self._deflected_angles(d1, self.geom, fortran=fortran, calc_rotation=calc_rotation)
+        else:
+            d1 = self._build_d1(self._fp_rgeom)[:, self._fp_ridx]
+            ptg, gamma = self._deflected_angles(d1, self._fp_pgeom, fortran=fortran, calc_rotation=calc_rotation)
+        del d1
+        self.tim.close('build_angles')
+        if self.verbosity:
+            print(self.tim)
+        return ptg, gamma
+
+    def _cache_angles(self, ptg:np.ndarray, gamma:np.ndarray or None):
+        """Stores deflected angles (and rotation angles if not None) in the cacher, according to the pointing format
+
+        """
+        if self.ptg_format == 'offset32':
+            self.cacher.cache('dptg', self._ptg2offsets(ptg))
+        else:
+            self.cacher.cache('ptg', ptg)
+        if gamma is not None:
+            self.cacher.cache('gamma', gamma)
+
+    def _footprint_geoms(self):
+        """Geometries used to build the pointing on the footprint
+
+            Returns:
+                geometry of the rings intersecting the footprint, indices of the footprint pixels in the latter,
+                and geometry with one single-pixel ring per footprint pixel (with the parent ring weights)
+
+        """
+        geom, pix = self.geom, self._fp_pix
+        rings = geom.pix2ring(pix)
+        assert np.all(rings >= 0), 'footprint pixels outside the geometry'
+        jphi = pix - geom.ofs[rings].astype(int)
+        rused, rpos = np.unique(rings, return_inverse=True)
+        nph = geom.nph[rused]
+        ofs = np.zeros(rused.size, dtype=np.uint64)
+        ofs[1:] = np.cumsum(nph)[:-1]
+        rgeom = Geom(geom.theta[rused], geom.phi0[rused], nph, ofs, geom.weight[rused])
+        ridx = ofs[rpos].astype(int) + jphi
+        return rgeom, ridx, self._pixels_geom(pix)
+
+    def _fp_scatter(self, values:np.ndarray):
+        """Maps footprint pixels values onto the full geometry, with zeros outside of the footprint
+
+        """
+        if self._fp_pix is None:
+            return values
+        ret = np.zeros(values.shape[:-1] + (self.geom.npix(),), dtype=values.dtype)
+        ret[..., self._fp_pix] = values
+        return ret
+
+    def _fp_gather(self, points:np.ndarray):
+        """Extracts the footprint pixels values from a full map (footprint pixels values are returned unchanged)
+
+        """
+        if self._fp_pix is None or points.shape[-1] != self.geom.npix():
+            return points
+        return points[..., self._fp_pix]
+
+    def _ptg2offsets(self, ptg:np.ndarray, chunk_size=2 ** 20):
+        """Converts absolute deflected angles to single precision offsets to the undeflected angles
+
+            The longitude offsets are in [-pi, pi)
+
+        """
+        dptg = np.empty(ptg.shape, dtype=np.float32)
+        for sli, tht, phi in self._undeflected_angles(chunk_size):
+            dptg[sli, 0] = ptg[sli, 0] - tht
+            dptg[sli, 1] = (ptg[sli, 1] - phi + np.pi) % (2 * np.pi) - np.pi
+        self.tim.add('ptg to offsets')
+        return dptg
+
+    def _offsets2ptg(self, dptg:np.ndarray, chunk_size=2 ** 20):
+        """Rebuilds absolute double precision deflected angles from single precision offsets
+
+        """
+        ptg = np.empty(dptg.shape, dtype=np.float64)
+        for sli, tht, phi in self._undeflected_angles(chunk_size):
+            ptg[sli, 0] = dptg[sli, 0] + tht
+            ptg[sli, 1] = (dptg[sli, 1] + phi) % (2 * np.pi)
+        self.tim.add('offsets to ptg')
+        return ptg
+
+    def _undeflected_angles(self, chunk_size:int):
+        """Iterates over chunks of the instance map pixels, yielding slices and co-latitudes and longitudes
+
+        """
+        npix = self.geom.npix()
+        for p0 in range(0, npix, chunk_size):
+            pix = np.arange(p0, min(p0 + chunk_size, npix), dtype=np.int64)
+            tht, phi = self.geom.pix2ang(pix)
+            yield slice(pix[0], pix[-1] + 1), tht, phi
+
+    def _deflected_angles(self, d1:np.ndarray, geom:Geom, fortran=True, calc_rotation=True):
+        """Deflected positions and angles from the spin-1 deflection field on the input geometry
+
+            Args:
+                d1: real and imaginary parts of the deflection, (2, npix) array on the geometry
+                geom: pixelization of the deflection, with ringstarts referring to d1
+                fortran(optional): uses the fortran implementation if ducc's is not available
+                calc_rotation(optional): also returns the rotation angles if set
+
+            Returns:
+                (npix, 2) array with new tht, phi, and (npix, ) array of -gamma (None if calc_rotation is not set)
+
+        """
+        gm_dtype = np.float32 if self.single_prec else np.float64
+        # Probably want to keep red, imd double precision for the calc?
+        if HAS_DUCCPOINTING:
+            tht, phi0, nph, ofs = geom.theta, geom.phi0, geom.nph, geom.ofs
+            tht_phip_gamma = get_deflected_angles(theta=tht, phi0=phi0, nphi=nph, ringstart=ofs, deflect=d1.T,
+                                                  calc_rotation=calc_rotation, nthreads=self.sht_tr)
+            self.tim.add('build angles <- th-phi%s (ducc)'%('-gm'*calc_rotation))
+            if calc_rotation:
+                return tht_phip_gamma[:, 0:2], tht_phip_gamma[:, 2].astype(gm_dtype, copy=False)
+            return tht_phip_gamma, None
+        npix = Geom.npix(geom)
+        if fortran and HAS_FORTRAN:
             red, imd = d1
-            for ir in np.argsort(self.geom.ofs): # We must follow the ordering of scarf position-space map
-                pixs = Geom.rings2pix(self.geom, [ir])
-                if pixs.size > 0:
-                    t_red = red[pixs]
-                    i_imd = imd[pixs]
-                    phis = Geom.phis(self.geom, ir)[pixs - self.geom.ofs[ir]]
-                    assert phis.size == pixs.size, (phis.size, pixs.size)
-                    thts = self.geom.theta[ir] * np.ones(pixs.size)
-                    thtp_, phip_ = d2ang(t_red, i_imd, thts , phis, int(np.round(np.cos(self.geom.theta[ir]))))
-                    sli = slice(startpix, startpix + len(pixs))
-                    thp_phip_gamma[0, sli] = thtp_
-                    thp_phip_gamma[1, sli] = phip_
-                    cot = np.cos(self.geom.theta[ir]) / np.sin(self.geom.theta[ir])
-                    d = np.sqrt(t_red ** 2 + i_imd ** 2)
-                    thp_phip_gamma[2, sli] = np.arctan2(i_imd, t_red ) - np.arctan2(i_imd, d * np.sin(d) * cot + t_red * np.cos(d))
-                    startpix += len(pixs)
-            self.tim.add('thts, phis and gammas  (python)')
-            self.cacher.cache(fns[0], thp_phip_gamma.T[:, 0:2])
+            tht, phi0, nph, ofs = geom.theta, geom.phi0, geom.nph, geom.ofs
+            if self.single_prec_ptg:
+                thp_phip_gamma = fremap.fpointing(red, imd, tht, phi0, nph, ofs, self.sht_tr)
+            else:
+                thp_phip_gamma = fremap.pointing(red, imd, tht, phi0, nph, ofs, self.sht_tr)
+            self.tim.add('build angles <- th-phi-gm (ftn)')
+            # I think this just trivially turns the F-array into a C-contiguous array:
+            return thp_phip_gamma.transpose()[:, 0:2], thp_phip_gamma.transpose()[:, 2].astype(gm_dtype) if calc_rotation else None
+        elif fortran and not HAS_FORTRAN:
+            print('Cant use fortran pointing building since import failed. Falling back on python impl.')
+        ptg, gamma = self._python_angles(d1, geom, calc_rotation)
+        return ptg, (gamma.astype(gm_dtype) if calc_rotation else None)
+
+    def _python_angles(self, d1:np.ndarray, geom:Geom, calc_rotation=True, cis=False, chunk_size=2 ** 16):
+        """Vectorized numpy implementation of the deflected positions and angles, in threaded chunks of pixels
+
+            Returns:
+                (npix, 2) array with new tht, phi, and (npix, ) array of -gamma, or of its cis if set
+                (None if calc_rotation is not set)
+
+        """
+        npix = Geom.npix(geom)
+        ofs = geom.ofs.astype(np.int64) # sorted in the Geom constructor
+        assert np.all(ofs + geom.nph.astype(np.int64) <= npix), 'ringstarts must refer to a compact map'
+        ptg = np.empty((npix, 2), dtype=np.float64)
+        gamma = np.empty(npix, dtype=complex if cis else float) if calc_rotation else None
+        def job(p0):
+            pix = np.arange(p0, min(p0 + chunk_size, npix), dtype=np.int64)
+            tht, phi = geom.pix2ang(pix)
+            ret = d2ang_gamma(d1[0, pix], d1[1, pix], tht, phi, calc_rotation=calc_rotation, cis=cis)
+            ptg[pix, 0], ptg[pix, 1] = ret[0], ret[1]
             if calc_rotation:
-                self.cacher.cache(fns[1], thp_phip_gamma.T[:, 2] if not self.single_prec else thp_phip_gamma.T[:, 2].astype(np.float32) )
-            self.tim.close('build_angles')
-            assert startpix == npix, (startpix, npix)
-            if self.verbosity:
-                print(self.tim)
-            return
+                gamma[pix] = ret[2]
+        with ThreadPoolExecutor(max_workers=self.sht_tr) as executor: # numpy releases the GIL on large arrays
+            list(executor.map(job, range(0, npix, chunk_size)))
+        self.tim.add('build angles <- th-phi%s (python)'%(('-cis' if cis else '-gm') * calc_rotation))
+        return ptg, gamma
 
     def _build_angleseig(self):
         """Builds deflected positions and angles
 
-            Returns (npix, 3) array with new tht, phi and -gamma
+            Caches (npix, 2) array with new tht, phi and (npix, ) array of cis(chi) = exp(i gamma)
 
         """
         fn_ptg, fn_cischi = 'ptg', 'cischi'
@@ -226,42 +647,81 @@ class deflection:
             self.tim.reset()
             red, imd = self._build_d1()
             # Probably want to keep red, imd double precision for the calc?
-            if HAS_FORTRAN:
+            if HAS_FORTRAN and hasattr(fremap, 'pointingeig'):
                 tht, phi0, nph, ofs = self.geom.theta, self.geom.phi0, self.geom.nph, self.geom.ofs
                 thp_phip_cischi = fremap.pointingeig(red, imd, tht, phi0, nph, ofs, self.sht_tr)
                 self.tim.add('build angles <- th-phi-cischi (ftn)')
                 # I think this just trivially turns the F-array into a C-contiguous array:
                 self.cacher.cache(fn_ptg, thp_phip_cischi.transpose()[:, 0:2])
                 self.cacher.cache(fn_cischi,thp_phip_cischi[2] + 1j * thp_phip_cischi[3])
-                self.tim.close('build_angles')
-                if self.verbosity:
-                    print(self.tim)
             else:
-                assert 0
+                ptg, cischi = self._python_angles(np.array([red, imd]), self.geom, cis=True)
+                self.cacher.cache(fn_ptg, ptg)
+                self.cacher.cache(fn_cischi, cischi.astype(np.complex64 if self.single_prec else np.complex128))
+            self.tim.close('build_angles')
+            if self.verbosity:
+                print(self.tim)
+
+    def _get_cischi(self):
+        """Returns the (npix, ) cis of the rotation angles of the spin-weighted fields
+
+        """
+        self._build_angleseig()
+        return self.cacher.load('cischi')
+
+    def get_bands(self, nbands:int):
+        """Splits the instance geometry into latitude bands, without overlap and with similar numbers of pixels
+
+            Args:
+                nbands: desired number of bands (fewer are returned if there are not enough rings)
+
+            Returns:
+                list of Geom instances, each respecting the north-south symmetry of the instance geometry,
+                with ringstarts referring to a compact map of the band
+
+        """
+        return self.geom.split(nbands, balance='npix', update_ringstart=True)
+
+    def _band_bytes_per_pix(self, spin:int, single_prec:bool or None=None):
+        """Rough estimate of the number of bytes needed per pixel of a band for band-wise lensing operations
+
+        """
+        rsize = 4 if (self.single_prec if single_prec is None else single_prec) else 8
+        d1_bytes = 2 * rtype[self.dlm.dtype](0).itemsize
+        ptg_bytes = 3 * 8 + rsize
+        return d1_bytes + ptg_bytes + (1 + (spin != 0)) * rsize
 
     def make_plan(self, lmax, spin):
         """Builds nuFFT plan for slightly faster transforms
 
-            Useful if many remapping operations will be done from the same deflection field
+            Useful if many remapping operations will be done from the same deflection field.
+            Plans are independent of spin, and are held by the instance plan cache, keyed by the deflection field
+            content, lmax and transform parameters
 
         """
-        if lmax not in self.plans:
-            print("(NB: plan independent of spin)")
+        ntheta = ducc0.fft.good_size(lmax + 2)
+        nphihalf = ducc0.fft.good_size(lmax + 1)
+        nphi = 2 * nphihalf
+
+        def builder():
             self.tim.start('planning %s'%lmax)
-            ntheta = ducc0.fft.good_size(lmax + 2)
-            nphihalf = ducc0.fft.good_size(lmax + 1)
-            nphi = 2 * nphihalf
-            ptg = self._get_ptg()
-            plan = ducc0.nufft.plan(nu2u=False, coord=ptg, grid_shape=(2 * ntheta - 2, nphi), epsilon=self.epsilon,
-                                        nthreads=self.sht_tr, periodicity=2 * np.pi, fft_order=True)
-            self.plans[lmax] = plan
+            if self.verbosity:
+                print("building nuFFT plan for lmax %s"%lmax)
+            plan = ducc0.nufft.plan(nu2u=False, coord=self._get_ptg(), grid_shape=(2 * ntheta - 2, nphi),
+                                    epsilon=self.epsilon, nthreads=self.sht_tr, periodicity=2 * np.pi, fft_order=True)
             self.tim.close('planning %s'%lmax)
-        return self.plans[lmax]
+            return plan
+        # rough estimate of the plan footprint: sorted coordinates and indices
+        nbytes = (self.geom.npix() if self._fp_pix is None else self._fp_pix.size) * (2 * 8 + 8)
+        return self.plan_cache.get((self.ptg_hash(), lmax, self.epsilon, self.sht_tr), builder, nbytes)
 
     def change_dlm(self, dlm:list or np.ndarray, mmax_dlm:int or None, cacher:cachers.cacher or None=None):
         assert len(dlm) == 2, (len(dlm), 'gradient and curl mode (curl can be none)')
         return deflection(self.geom, dlm[0], mmax_dlm, numthreads=self.sht_tr, cacher=cacher, dclm=dlm[1],
-                          verbosity=self.verbosity, epsilon=self.epsilon, single_prec=self.single_prec)
+                          verbosity=self.verbosity, epsilon=self.epsilon, single_prec=self.single_prec,
+                          ptg_format=self.ptg_format, planned=self.planned, plan_cache=self.plan_cache,
+                          footprint=self.footprint, max_memory=self.max_memory,
+                          ptg_cache=self.ptg_cache if cacher is None else None)
 
     def change_geom(self, lens_geom:Geom, cacher:cachers.cacher or None=None):
         """Returns a deflection instance with a different position-space geometry
@@ -274,7 +734,91 @@ class deflection:
         """
         print("**** change_geom, DO YOU REALLY WANT THIS??")
         return deflection(lens_geom, self.dlm, self.mmax_dlm, self.sht_tr, cacher, self.dclm,
-                          verbosity=self.verbosity, epsilon=self.epsilon, planned=self.planned)
+                          verbosity=self.verbosity, epsilon=self.epsilon, planned=self.planned,
+                          ptg_format=self.ptg_format, plan_cache=self.plan_cache, max_memory=self.max_memory,
+                          ptg_cache=self.ptg_cache if cacher is None else None)
+
+    def inverse(self, niter_max:int=10, tol:float or None=None, cacher:cachers.cacher or None=None):
+        r"""Returns the inverse deflection, with its pointing already built
+
+            The inverse displacement :math:`d^{-1}(m)` is such that deflecting :math:`n = m + d^{-1}(m)`
+            by :math:`d(n)` lands back on :math:`m`. It is solved for on the instance geometry with quasi-Newton
+            iterations starting from :math:`-d`, using the distortion matrix of the deflection at the undeflected points.
+
+            Args:
+                niter_max: maximal number of iterations
+                tol: the iterations stop once the largest residual is below tol times the rms deflection
+                     (defaults to the instance epsilon)
+                cacher: cacher instance of the returned deflection (defaults to a memory cacher, also when the
+                        instance has a ptg_cache)
+
+            Returns:
+                deflection instance of the same type, with identical geometry and resolution parameters
+
+            Note:
+                The pointing of the returned instance is the one of the iterated solution on the grid, while its
+                harmonic coefficients are obtained with the geometry quadrature weights.
+                The geometry should then be exact for the deflection band-limit (e.g. Gauss-Legendre).
+                For this reason, this pointing is never written to the content-addressed ptg_cache
+
+        """
+        assert self._fp_pix is None, 'inverse deflection not implemented with footprint'
+        self.tim.start('inverse')
+        self.tim.reset()
+        geom, lmax, mmax, tr = self.geom, self.lmax_dlm, self.mmax_dlm, self.sht_tr
+        tol = self.epsilon if tol is None else tol
+        dgclm = np.empty((2, self.dlm.size), dtype=self.dlm.dtype)
+        dgclm[0] = self.dlm
+        dgclm[1] = np.zeros_like(self.dlm) if self.dclm is None else self.dclm
+        red, imd = self._build_d1()
+        sig_d = np.sqrt(np.mean(red ** 2 + imd ** 2))
+        dinv = -(red + 1j * imd)
+        del red, imd
+        # Distortion matrix entries a = -\bar\eth d / 2 = -(k + i w) and b = -\eth d / 2 = g1 + i g2:
+        d2k = -0.5 * get_spin_lower(1, lmax)
+        d2g = -0.5 * get_spin_raise(1, lmax)
+        kw = geom.synthesis(np.array([[almxfl(dgclm[0], d2k, mmax, False)], [almxfl(dgclm[1], d2k, mmax, False)]]),
+                            0, lmax, mmax, tr)[:, 0]
+        g12 = geom.synthesis(np.array([almxfl(dgclm[0], d2g, mmax, False), almxfl(dgclm[1], d2g, mmax, False)]),
+                             2, lmax, mmax, tr)
+        a1 = 1. - (kw[0] + 1j * kw[1])
+        b = g12[0] + 1j * g12[1]
+        det = np.abs(a1) ** 2 - np.abs(b) ** 2
+        del kw, g12
+        self.tim.add('inverse <- distortion matrix')
+        res_prev, res_best, best = np.inf, np.inf, None
+        for it in range(niter_max + 1):
+            ptg, gamma = self._deflected_angles(np.array([dinv.real, dinv.imag]), geom)
+            # Deflection at the inverse-deflected points, parallel-transported back:
+            dn = synthesis_general(lmax=lmax, mmax=mmax, alm=dgclm, loc=ptg, spin=1, epsilon=self.epsilon, nthreads=tr)
+            dn = dn[0] + 1j * dn[1]
+            if HAS_DUCCROTATE:
+                ducc0.misc.lensing_rotate(dn, gamma.astype(np.float64), 1, tr)
+            else:
+                dn *= np.exp(1j * gamma)
+            dn += dinv # residual
+            res = np.max(np.abs(dn)) / sig_d if sig_d > 0 else 0.
+            if self.verbosity:
+                print('inverse it %s: max. rel. residual %.2e'%(it, res))
+            if res < res_best: # (the iterations can stall and make things worse close to convergence)
+                res_best, best = res, (dinv, ptg, gamma)
+            if res <= tol or res >= res_prev or it == niter_max:
+                break
+            res_prev = res
+            dinv = dinv - (np.conj(a1) * dn - b * np.conj(dn)) / det
+        del dn, a1, b, det
+        dinv, ptg, gamma = best
+        self.tim.add('inverse <- %s iterations'%it)
+        dinv_lm = geom.adjoint_synthesis(np.array([dinv.real, dinv.imag]), 1, lmax, mmax, tr)
+        self.tim.add('inverse <- adjoint synthesis')
+        # The iterated pointing differs from the one the alms would give, hence not in the shared ptg_cache:
+        cacher = cachers.cacher_mem(safe=False) if cacher is None else cacher
+        ret = self.change_dlm([dinv_lm[0].astype(self.dlm.dtype), dinv_lm[1].astype(self.dlm.dtype)], mmax, cacher=cacher)
+        ret._cache_angles(ptg, gamma)
+        self.tim.close('inverse')
+        if self.verbosity:
+            print(self.tim)
+        return ret
 
     def gclm2lenpixs(self, gclm:np.ndarray, mmax:int or None, spin:int, pixs:np.ndarray[int], polrot=True):
         """Produces the remapped field on the required lensing geometry pixels 'exactly', by brute-force calculation
@@ -283,29 +827,61 @@ class deflection:
                 The number of pixels must be small here, otherwise way too slow
 
             Note:
-                If the remapping angles etc were not calculated previously, it will build the full map, so may take some time.
+                If the remapping angles were not calculated previously, only those of the requested pixels are built
 
         """
         assert spin >= 0, spin
         gclm = np.atleast_2d(gclm)
         sth_mode = ducc_sht_mode(gclm, spin)
-        ptg = self._get_ptg()
-        thts, phis = ptg[pixs, 0], ptg[pixs, 1]
-        nph = 2 * np.ones(thts.size, dtype=np.uint64)  # I believe at least 2 points per ring
-        ofs = 2 * np.arange(thts.size, dtype=np.uint64)
-        wt = np.ones(thts.size, dtype=float)
-        geom = Geom(thts.copy(), phis.copy(), nph, ofs, wt)
-        gclm = np.atleast_2d(gclm)
+        pixs = np.atleast_1d(pixs)
+        calc_rotation = bool(spin and polrot)
+        fns = ['dptg' if self.ptg_format == 'offset32' else 'ptg'] + calc_rotation * ['gamma']
+        if self._fp_pix is None and np.all([self.cacher.is_cached(fn) for fn in fns]):
+            ptg = self._get_ptg()[pixs]
+            gamma = self._get_gamma()[pixs] if calc_rotation else None
+        else:
+            ptg, gamma = self._pixels_angles(pixs, calc_rotation=calc_rotation)
+        geom = self._points_geom(ptg[:, 0], ptg[:, 1])
         lmax = Alm.getlmax(gclm[0].size, mmax)
         if mmax is None: mmax = lmax
         m = geom.synthesis(gclm, spin, lmax, mmax, self.sht_tr, mode=sth_mode)[:, 0::2]
         # could do: complex view trick etc
-        if spin and polrot:
-            gamma = self._get_gamma()[pixs]
+        if calc_rotation:
             m = np.exp(1j * spin * gamma) * (m[0] + 1j * m[1])
             return m.real, m.imag
         return m.squeeze()
 
+    @staticmethod
+    def _points_geom(thts:np.ndarray, phis:np.ndarray):
+        """Geometry with one ring per point, such that a synthesis on it gives the exact values at the points
+            (on every other pixel)
+
+        """
+        nph = 2 * np.ones(thts.size, dtype=np.uint64)  # I believe at least 2 points per ring
+        ofs = 2 * np.arange(thts.size, dtype=np.uint64)
+        wt = np.ones(thts.size, dtype=float)
+        return Geom(thts.copy(), phis.copy(), nph, ofs, wt)
+
+    def _pixels_geom(self, pixs:np.ndarray[int]):
+        """Geometry with one single-pixel ring per input pixel of the instance geometry (with the parent ring weights)
+
+        """
+        geom = self.geom
+        rings = geom.pix2ring(pixs)
+        assert np.all(rings >= 0), 'pixels outside the geometry'
+        jphi = pixs - geom.ofs[rings].astype(int)
+        phis = geom.phi0[rings] + jphi * (2 * np.pi / geom.nph[rings])
+        return Geom(geom.theta[rings], phis, np.ones(pixs.size, dtype=np.uint64), np.arange(pixs.size, dtype=np.uint64),
+                    geom.weight[rings])
+
+    def _pixels_angles(self, pixs:np.ndarray[int], calc_rotation=True):
+        """Deflected angles (and rotation angles) of a few pixels of the instance geometry, without any full-sky operation
+
+        """
+        pgeom = self._pixels_geom(pixs)
+        d1 = self._build_d1(self._points_geom(pgeom.theta, pgeom.phi0))[:, 0::2]
+        return self._deflected_angles(d1, pgeom, calc_rotation=calc_rotation)
+
     def gclm2lenmap(self, gclm:np.ndarray, mmax:int or None, spin, backwards:bool, polrot=True, ptg=None):
         """Produces deflected spin-weighted map from alm array and instance pointing information
 
@@ -346,44 +922,213 @@ class deflection:
             self.tim.add('interpolation')
             self.tim.close('gclm2lenmap')
             return ret
-        # transform slm to Clenshaw-Curtis map
-        ntheta = ducc0.fft.good_size(lmax_unl + 2)
-        nphihalf = ducc0.fft.good_size(lmax_unl + 1)
-        nphi = 2 * nphihalf
-        # Is this any different to scarf wraps ?
-        # NB: type of map, map_df, and FFTs will follow that of input gclm
-        mode = ducc_sht_mode(gclm, spin)
-        map = ducc0.sht.experimental.synthesis_2d(alm=gclm, ntheta=ntheta, nphi=nphi,
-                                spin=spin, lmax=lmax_unl, mmax=mmax, geometry="CC", nthreads=self.sht_tr, mode=mode)
-        self.tim.add('experimental.synthesis_2d (%s)'%mode)
-        # extend map to double Fourier sphere map
-        map_dfs = np.empty((2 * ntheta - 2, nphi), dtype=map.dtype if spin == 0 else ctype[map.dtype])
-        if spin == 0:
-            map_dfs[:ntheta, :] = map[0]
-        else:
-            map_dfs[:ntheta, :].real = map[0]
-            map_dfs[:ntheta, :].imag = map[1]
-        del map
+        # transform slm to Clenshaw-Curtis map, then to double Fourier sphere map in Fourier space
+        map_dfs = gclm2dfs(gclm, lmax_unl, mmax, spin, self.sht_tr, tim=self.tim)
+        values = self._dfs2values(map_dfs, lmax_unl, ptg=ptg)
+        if polrot * spin:
+            self._polrot(values, spin)
+        self.tim.close('gclm2lenmap')
+        if self.verbosity:
+            print(self.tim)
+        # Return real array of shape (2, npix) for spin > 0
+        ret = values.real if spin == 0 else values.view(rtype[values.dtype]).reshape((values.size, 2)).T
+        return ret if ptg is not None else self._fp_scatter(ret)
 
-        map_dfs[ntheta:, :nphihalf] = map_dfs[ntheta - 2:0:-1, nphihalf:]
-        map_dfs[ntheta:, nphihalf:] = map_dfs[ntheta - 2:0:-1, :nphihalf]
-        if (spin % 2) != 0:
-            map_dfs[ntheta:, :] *= -1
-        self.tim.add('map_dfs build')
+    def dfs2lenmap(self, dfs:dfsgrid, polrot=True, ptg=None):
+        """Produces deflected spin-weighted map from a precomputed double Fourier sphere grid of the undeflected field
 
-        # go to Fourier space
-        if spin == 0:
-            tmp = np.empty(map_dfs.shape, dtype=ctype[map_dfs.dtype])
-            map_dfs = ducc0.fft.c2c(map_dfs, axes=(0, 1), inorm=2, nthreads=self.sht_tr, out=tmp)
-            del tmp
-        else:
-            map_dfs = ducc0.fft.c2c(map_dfs, axes=(0, 1), inorm=2, nthreads=self.sht_tr, out=map_dfs)
-        self.tim.add('map_dfs 2DFFT')
+            Only the non-uniform FFT and the rotation of spin-weighted fields are performed here.
 
-        if self.planned: # planned nufft
-            assert ptg is None
-            plan = self.make_plan(lmax_unl, spin)
-            values = plan.u2nu(grid=map_dfs, forward=False, verbosity=self.verbosity)
+            Args:
+                dfs: dfsgrid instance of the field to deflect (can be shared among many deflection instances)
+                polrot(optional): includes small rotation of spin-weighted fields (defaults to True)
+                ptg(optional): custom pointing, (npix, 2) array with co-latitudes and longitudes
+
+            Returns:
+                deflected map, with the same format as the output of gclm2lenmap
+
+        """
+        self.tim.start('dfs2lenmap')
+        self.tim.reset()
+        values = self._dfs2values(dfs.grid, dfs.lmax, ptg=ptg)
+        if polrot * dfs.spin:
+            self._polrot(values, dfs.spin)
+        self.tim.close('dfs2lenmap')
+        if self.verbosity:
+            print(self.tim)
+        ret = values.real if dfs.spin == 0 else values.view(rtype[values.dtype]).reshape((values.size, 2)).T
+        return ret if ptg is not None else self._fp_scatter(ret)
+
+    def gclm2lentod(self, gclm:np.ndarray, mmax:int or None, spin:int, pointing, polrot=True):
+        """Deflected field samples along arbitrary detector pointing, processed chunk by chunk
+
+            The double Fourier sphere grids of the undeflected field and of the deflection are built once.
+            Each chunk then costs two non-uniform FFTs (deflection and field values) and the deflected angles
+            calculation, so that the full pointing never needs to be held in memory.
+
+            Args:
+                gclm: input alm array, shape (ncomp, nalm), where ncomp can be 1 (gradient-only) or 2 (gradient or curl)
+                mmax: mmax parameter of alm array layout, if different from lmax
+                spin: spin (>=0) of the field
+                pointing: iterable over chunks of (theta, phi) or (theta, phi, psi) 1d arrays:
+                          undeflected detector co-latitudes and longitudes, and optionally polarisation angles
+                polrot(optional): includes small rotation of spin-weighted fields (defaults to True)
+
+            Yields:
+                deflected values of each chunk, (nsamples, ) array for spin 0, or for non-zero spin
+                (2, nsamples) array with the real and imaginary parts, or if psi is given the (nsamples, ) projection
+                :math:`{\rm Re} \left(e^{-is\psi} (G + iC)\right)` (i.e. Q cos 2psi + U sin 2psi for polarization)
+
+            Note:
+                Works with the unlensed positions. The instance geometry, pointing cache and footprint are not used
+
+        """
+        assert spin >= 0, spin
+        assert HAS_DUCCPOINTING and HAS_DUCCROTATE, 'this requires a more recent ducc0 version'
+        gclm = np.atleast_2d(gclm)
+        if self.single_prec and gclm.dtype != np.complex64:
+            gclm = gclm.astype(np.complex64)
+        dfs = dfsgrid(gclm, mmax, spin, self.sht_tr)
+        dfs_d = self._dlm2dfs()
+        for chunk in pointing:
+            self.tim.start('gclm2lentod')
+            self.tim.reset()
+            calc_rotation = bool(spin and polrot)
+            ptg = self._chunk_angles(dfs_d, chunk[0], chunk[1], calc_rotation)
+            nsamples = ptg.shape[0]
+            values = self._dfs2values(dfs.grid, dfs.lmax, ptg=np.ascontiguousarray(ptg[:, 0:2]))
+            if calc_rotation:
+                lensing_rotate(values, ptg[:, 2].astype(rtype[values.dtype]), spin, self.sht_tr)
+                self.tim.add('polrot (ducc)')
+            del ptg
+            if spin == 0:
+                values = values.real
+            elif len(chunk) > 2:
+                values = (values * np.exp(-1j * spin * np.asarray(chunk[2]))).real
+            else:
+                values = values.view(rtype[values.dtype]).reshape((nsamples, 2)).T
+            self.tim.close('gclm2lentod')
+            yield values
+
+    def _dlm2dfs(self):
+        """Double Fourier sphere grid of the spin-1 deflection field
+
+        """
+        dgclm = np.array([self.dlm, np.zeros_like(self.dlm) if self.dclm is None else self.dclm])
+        return dfsgrid(dgclm, self.mmax_dlm, 1, self.sht_tr)
+
+    def _chunk_angles(self, dfs_d:dfsgrid, tht:np.ndarray, phi:np.ndarray, calc_rotation:bool):
+        """Deflected angles of arbitrary undeflected positions, from the double Fourier sphere grid of the deflection
+
+            Returns:
+                (nsamples, 2) array with new tht, phi, or (nsamples, 3) array with new tht, phi and -gamma
+
+        """
+        tht, phi = np.asarray(tht, dtype=np.float64), np.asarray(phi, dtype=np.float64)
+        nsamples = tht.size
+        loc = np.empty((nsamples, 2), dtype=np.float64)
+        loc[:, 0], loc[:, 1] = tht, phi % (2 * np.pi)
+        d1 = self._dfs2values(dfs_d.grid, dfs_d.lmax, ptg=loc)
+        ptg = get_deflected_angles(theta=loc[:, 0].copy(), phi0=loc[:, 1].copy(), nphi=np.ones(nsamples, dtype=np.uint64),
+                                   ringstart=np.arange(nsamples, dtype=np.uint64),
+                                   deflect=d1.astype(np.complex128, copy=False).view(np.float64).reshape((nsamples, 2)),
+                                   calc_rotation=calc_rotation, nthreads=self.sht_tr)
+        self.tim.add('deflected angles')
+        return ptg
+
+    def _lenconv_interpolator(self, slm:np.ndarray, blm:np.ndarray, kmax:int, separate:bool):
+        """totalconvolve interpolator of the sky and beam, built once for any number of pointing chunks
+
+        """
+        slm, blm = np.atleast_2d(slm).astype(np.complex128), np.atleast_2d(blm).astype(np.complex128)
+        assert slm.shape[0] in [1, 3] and blm.shape[0] == slm.shape[0], (slm.shape, blm.shape)
+        lmax = Alm.getlmax(slm[0].size, None)
+        assert Alm.getsize(lmax, kmax) == blm[0].size, ('beam lmax must match the sky lmax', blm.shape, lmax, kmax)
+        inter = ducc0.totalconvolve.Interpolator(slm, blm, separate, lmax, kmax, epsilon=self.epsilon,
+                                                 ofactor=self.ofactor, nthreads=self.sht_tr)
+        self.tim.add('interpolator setup')
+        return inter
+
+    def convolve2lentod(self, slm:np.ndarray, blm:np.ndarray, kmax:int, pointing, separate=False):
+        """Deflected and beam-convolved detector samples, processed chunk by chunk
+
+            The sky is lensed and convolved with the (arbitrary, possibly polarized) beam in one pass with
+            ducc0.totalconvolve, evaluating the interpolator at the deflected positions,
+            and at orientations corrected by the rotation angle of the local basis.
+            The interpolator data cube and the deflection grid are built once and reused for all chunks.
+
+            Args:
+                slm: sky alm array, shape (ncomp, nalm) with ncomp 1 (T) or 3 (T, E, B), mmax = lmax
+                blm: beam alm array, shape (ncomp, nalm_beam), same lmax as the sky and mmax = kmax
+                kmax: maximal azimuthal moment of the beam
+                pointing: iterable over chunks of (theta, phi, psi) 1d arrays:
+                          undeflected detector co-latitudes, longitudes and orientations
+                separate(optional): returns the contributions of each component separately if set
+
+            Yields:
+                deflected and convolved values of each chunk, (ncomp or 1, nsamples) array
+
+            Note:
+                See ducc0.totalconvolve for the sky and beam conventions. This is double precision only
+
+        """
+        assert HAS_DUCCPOINTING, 'this requires a more recent ducc0 version'
+        self.tim.start('convolve2lentod')
+        self.tim.reset()
+        inter = self._lenconv_interpolator(slm, blm, kmax, separate)
+        dfs_d = self._dlm2dfs()
+        self.tim.close('convolve2lentod')
+        for tht, phi, psi in pointing:
+            self.tim.start('convolve2lentod')
+            self.tim.reset()
+            ptg = self._chunk_angles(dfs_d, tht, phi, True)
+            ptg[:, 2] = psi - ptg[:, 2] # the beam orientation relative to the local basis at the deflected position
+            values = inter.interpol(ptg)
+            self.tim.add('interpol')
+            self.tim.close('convolve2lentod')
+            yield values
+
+    def convolve2lenmap(self, slm:np.ndarray, blm:np.ndarray, kmax:int, psi:float or np.ndarray=0., separate=False):
+        """Deflected and beam-convolved map on the instance geometry, using the instance pointing
+
+            Args:
+                slm: sky alm array, shape (ncomp, nalm) with ncomp 1 (T) or 3 (T, E, B), mmax = lmax
+                blm: beam alm array, shape (ncomp, nalm_beam), same lmax as the sky and mmax = kmax
+                kmax: maximal azimuthal moment of the beam
+                psi(optional): beam orientation, scalar or per pixel
+                separate(optional): returns the contributions of each component separately if set
+
+            Returns:
+                (ncomp or 1, npix) array
+
+            Note:
+                See convolve2lentod for arbitrary detector pointing
+
+        """
+        self.tim.start('convolve2lenmap')
+        self.tim.reset()
+        inter = self._lenconv_interpolator(slm, blm, kmax, separate)
+        ptg = self._get_ptg()
+        loc = np.empty((ptg.shape[0], 3), dtype=np.float64)
+        loc[:, 0:2] = ptg
+        del ptg
+        if np.isscalar(psi):
+            psi = np.full(loc.shape[0], psi)
+        loc[:, 2] = self._fp_gather(psi) - self._get_gamma()
+        self.tim.add('get ptg')
+        values = inter.interpol(loc)
+        self.tim.add('interpol')
+        self.tim.close('convolve2lenmap')
+        return self._fp_scatter(values)
+
+    def _dfs2values(self, map_dfs:np.ndarray, lmax:int, ptg=None):
+        """Performs the uniform to non-uniform FFT of a double Fourier sphere grid, planned or not
+
+        """
+        if self.planned and ptg is None: # planned nufft
+            plan = self.make_plan(lmax, 0)
+            # planned transforms with double-precision pointing only accept double-precision grids
+            values = plan.u2nu(grid=map_dfs.astype(np.complex128, copy=False), forward=False, verbosity=self.verbosity)
             self.tim.add('planned u2nu')
         else:
             # perform NUFFT
@@ -395,26 +1140,89 @@ class deflection:
                                       epsilon=self.epsilon, nthreads=self.sht_tr,
                                       verbosity=self.verbosity, periodicity=2 * np.pi, fft_order=True)
             self.tim.add('u2nu')
+        return values
 
-        if polrot * spin:
-            if self._cis:
-                cis = self._get_cischi()
-                for i in range(polrot * abs(spin)):
-                    values *= cis
-                self.tim.add('polrot (cis)')
-            else:
-                if HAS_DUCCROTATE:
-                    lensing_rotate(values, self._get_gamma(), spin, self.sht_tr)
-                    self.tim.add('polrot (ducc)')
-                else:
-                    func = fremap.apply_inplace if values.dtype == np.complex128 else fremap.apply_inplacef
-                    func(values, self._get_gamma(), spin, self.sht_tr)
-                    self.tim.add('polrot (fortran)')
-        self.tim.close('gclm2lenmap')
+    def gclm2lenmap_many(self, gclms:np.ndarray or list, mmax:int or None, spins:int or list, polrot=True):
+        """Produces several deflected maps from a stack of alm arrays, sharing the instance pointing
+
+            All maps are sent through a single multi-transform non-uniform FFT, so that the pointing is loaded once
+            and the interpolation kernels evaluated once per pixel for the entire stack.
+
+            Args:
+                gclms: stack of alm arrays, shape (nmaps, ncomp, nalm) or list of (ncomp, nalm) arrays,
+                       ncomp can be 1 (gradient-only) or 2 (gradient or curl). All must share the same lmax.
+                mmax: mmax parameter of alm array layout, if different from lmax
+                spins: spin (>=0) of each map, or a single spin for all maps
+                polrot(optional): includes small rotation of spin-weighted fields (defaults to True)
+
+            Returns:
+                list of deflected maps, with the same format as the output of gclm2lenmap
+
+            Note:
+                This holds nmaps double Fourier sphere grids in memory at the same time, and the full pointing.
+                It is then not available if the memory plan uses latitude bands
+
+        """
+        assert self.nbands == 1, 'gclm2lenmap_many builds the full pointing, not compatible with the %s latitude bands of the memory plan'%self.nbands
+        self.tim.start('gclm2lenmap_many')
+        self.tim.reset()
+        nmaps = len(gclms)
+        spins = [spins] * nmaps if np.isscalar(spins) else list(spins)
+        assert len(spins) == nmaps, (len(spins), nmaps)
+        lmax_unl = Alm.getlmax(np.atleast_2d(gclms[0])[0].size, mmax)
+        if mmax is None:
+            mmax = lmax_unl
+        ntheta = ducc0.fft.good_size(lmax_unl + 2)
+        nphi = 2 * ducc0.fft.good_size(lmax_unl + 1)
+        # planned transforms with double-precision pointing only accept double-precision grids
+        grid_dtype = np.complex64 if (self.single_prec and not self.planned) else np.complex128
+        map_dfs = np.empty((nmaps, 2 * ntheta - 2, nphi), dtype=grid_dtype)
+        for i, (gclm, spin) in enumerate(zip(gclms, spins)):
+            gclm = np.atleast_2d(gclm)
+            assert Alm.getlmax(gclm[0].size, mmax) == lmax_unl, 'all alm arrays must share the same lmax'
+            if gclm.dtype != grid_dtype:
+                gclm = gclm.astype(grid_dtype)
+            gclm2dfs(gclm, lmax_unl, mmax, spin, self.sht_tr, out=map_dfs[i])
+        self.tim.add('map_dfs build and 2DFFT (%s maps)'%nmaps)
+        if self.planned:
+            plan = self.make_plan(lmax_unl, 0)
+            values = plan.u2nu(grid=map_dfs, forward=False, verbosity=self.verbosity)
+            self.tim.add('planned u2nu (%s maps)'%nmaps)
+        else:
+            ptg = self._get_ptg()
+            self.tim.add('get ptg')
+            values = ducc0.nufft.u2nu(grid=map_dfs, coord=ptg, forward=False,
+                                      epsilon=self.epsilon, nthreads=self.sht_tr,
+                                      verbosity=self.verbosity, periodicity=2 * np.pi, fft_order=True)
+            self.tim.add('u2nu (%s maps)'%nmaps)
+        del map_dfs
+        ret = []
+        for i, spin in enumerate(spins):
+            if polrot * spin:
+                self._polrot(values[i], spin)
+            ret.append(self._fp_scatter(values[i].real if spin == 0 else values[i].view(rtype[values.dtype]).reshape((values[i].size, 2)).T))
+        self.tim.close('gclm2lenmap_many')
         if self.verbosity:
             print(self.tim)
-        # Return real array of shape (2, npix) for spin > 0
-        return values.real if spin == 0 else values.view(rtype[values.dtype]).reshape((values.size, 2)).T
+        return ret
+
+    def _polrot(self, values:np.ndarray, spin:int):
+        """Applies in place the rotation of spin-weighted deflected values
+
+        """
+        if self._cis:
+            cis = self._get_cischi()
+            for i in range(abs(spin)):
+                values *= cis
+            self.tim.add('polrot (cis)')
+        else:
+            if HAS_DUCCROTATE:
+                lensing_rotate(values, self._get_gamma(), spin, self.sht_tr)
+                self.tim.add('polrot (ducc)')
+            else:
+                func = fremap.apply_inplace if values.dtype == np.complex128 else fremap.apply_inplacef
+                func(values, self._get_gamma(), spin, self.sht_tr)
+                self.tim.add('polrot (fortran)')
 
     def lenmap2gclm(self, points:np.ndarray[complex or float], spin:int, lmax:int, mmax:int, gclm_out=None,
                     sht_mode='STANDARD'):
@@ -428,6 +1236,7 @@ class deflection:
         """
         self.tim.start('lenmap2gclm')
         self.tim.reset()
+        points = self._fp_gather(points)
         if spin == 0 and not np.iscomplexobj(points):
             points = points.astype(ctype[points.dtype]).squeeze()
         if spin > 0 and not np.iscomplexobj(points):
@@ -476,6 +1285,95 @@ class deflection:
         self.tim.close('lenmap2gclm')
         return slm.squeeze()
 
+    def lenmap2dlm(self, residual:np.ndarray, gclm:np.ndarray, mmax:int or None, spin:int, polrot=True,
+                   out_sht_mode='STANDARD'):
+        r"""Adjoint of the linearized remapping operation with respect to the deflection field
+
+            For a residual map :math:`R` (same format as the output of gclm2lenmap), this returns the gradient
+            with respect to the deflection alms of :math:`\sum_{\rm pix} R \cdot X^{\rm len}`, with :math:`X^{\rm len}`
+            the remapped field gclm2lenmap(gclm, mmax, spin, False, polrot).
+
+            The spin-raised and lowered derivatives of the unlensed field are evaluated at the deflected positions
+            with the cached pointing, contracted with the residual, and sent through the adjoint spin-1 synthesis.
+
+            Args:
+                residual: real lensed-map residual, (1 or 2, npix) array on the instance geometry
+                gclm: unlensed alm array, shape (ncomp, nalm), where ncomp can be 1 (gradient-only) or 2 (gradient or curl)
+                mmax: mmax parameter of alm array layout, if different from lmax
+                spin: spin (>=0) of the remapped field
+                polrot(optional): includes small rotation of spin-weighted fields (defaults to True,
+                                  must be set for non-zero spin)
+                out_sht_mode(optional): 'GRAD_ONLY' if only the gradient mode of the deflection is desired
+
+            Returns:
+                (1 or 2, nalm) array with gradient and curl modes, with lmax and mmax of the instance deflection alms
+
+            Note:
+                This is the adjoint in the same sense as adjoint_synthesis is the adjoint of synthesis
+
+        """
+        assert spin >= 0, spin
+        assert polrot or spin == 0, 'not implemented without the rotation of spin-weighted fields'
+        self.tim.start('lenmap2dlm')
+        self.tim.reset()
+        gclm = np.atleast_2d(gclm).astype(np.complex128)
+        lmax = Alm.getlmax(gclm[0].size, mmax)
+        if mmax is None:
+            mmax = lmax
+        residual = self._fp_gather(np.atleast_2d(residual)).astype(np.float64)
+        R = residual[0] + 1j * residual[1] if spin else residual[0]
+        ptg = self._get_ptg()
+        eig = np.exp(1j * self._get_gamma().astype(np.float64)) # needed for the geometry even if polrot is not set
+        self.tim.add('ptg and gamma')
+
+        def sgen(alm, s):
+            m = synthesis_general(lmax=lmax, mmax=mmax, alm=alm, loc=ptg, spin=s, epsilon=self.epsilon,
+                                  nthreads=self.sht_tr)
+            return m[0] if s == 0 else m[0] + 1j * m[1]
+        # derivatives of the unlensed field at the deflected positions, in their local basis
+        rais = get_spin_raise(spin, lmax)
+        if spin == 0:
+            Dp = sgen(np.array([-almxfl(gclm[0], rais, mmax, False), np.zeros_like(gclm[0])]), 1)
+            Gn = -R * Dp
+            del Dp
+        else:
+            lowr = get_spin_lower(spin, lmax)
+            G = gclm[0]
+            C = gclm[1] if gclm.shape[0] > 1 else np.zeros_like(G)
+            Dp = sgen(np.array([almxfl(G, rais, mmax, False), almxfl(C, rais, mmax, False)]), spin + 1)
+            if spin == 1:
+                Dm = -(sgen(np.atleast_2d(almxfl(G, lowr, mmax, False)), 0) + 1j * sgen(np.atleast_2d(almxfl(C, lowr, mmax, False)), 0))
+            else:
+                Dm = sgen(np.array([almxfl(G, lowr, mmax, False), almxfl(C, lowr, mmax, False)]), spin - 1)
+            E = eig ** spin
+            Gn = -0.5 * (np.conj(R) * E * Dp + R * np.conj(E) * np.conj(Dm))
+            del Dp, Dm
+            L = E * sgen(np.array([G, C]), spin)
+        self.tim.add('synthesis general')
+        # back to the undeflected positions, through the derivatives of the pointing
+        H = Gn * eig
+        del Gn
+        d = self._fp_gather(self._build_d1())
+        d = d[0] + 1j * d[1]
+        ad = np.abs(d)
+        u = np.where(ad > 0, d / np.where(ad > 0, ad, 1.), 1.)
+        f = np.where(ad > 0, np.sin(ad) / np.where(ad > 0, ad, 1.), 1.)
+        Gd = (0.5 * (1. + f)) * H + (0.5 * (1. - f)) * u ** 2 * np.conj(H)
+        if spin: # rotation of the transported basis (holonomy of the area swept by the geodesic)
+            c = np.where(ad > 0, (1. - np.cos(ad)) / np.where(ad > 0, ad, 1.), 0.)
+            Gd -= spin * np.imag(np.conj(R) * L) * c * 1j * u
+            del L
+        del H, d, ad, u, f
+        Gd = self._fp_scatter(Gd)
+        self.tim.add('pixel gradient')
+        ret = self.geom.adjoint_synthesis(np.array([Gd.real, Gd.imag]), 1, self.lmax_dlm, self.mmax_dlm, self.sht_tr,
+                                          apply_weights=False, mode=out_sht_mode)
+        self.tim.add('adjoint_synthesis (%s)'%out_sht_mode)
+        self.tim.close('lenmap2dlm')
+        if self.verbosity:
+            print(self.tim)
+        return ret
+
     def lensgclm(self, gclm:np.ndarray, mmax:int or None, spin:int, lmax_out:int, mmax_out:int or None,
                  gclm_out:np.ndarray=None, backwards=False, nomagn=False, polrot=True, out_sht_mode='STANDARD'):
         """Adjoint remapping operation from lensed alm space to unlensed alm space
@@ -539,8 +1437,7 @@ class deflection:
                 inter = ducc0.totalconvolve.Interpolator(lmax_out, spin, 1, epsilon=self.epsilon,
                                                          ofactor=self.ofactor, nthreads=self.sht_tr)
                 I = self.geom.synthesis(gclm, spin, lmax_unl, mmax, self.sht_tr, mode=input_sht_mode)
-                for ofs, w, nph in zip(self.geom.ofs, self.geom.weight, self.geom.nph):
-                    I[ofs:ofs + nph] *= w
+                self.geom.apply_weights(I, self.sht_tr)
                 self.tim.add('points')
                 xptg = self._get_ptg()
                 self.tim.add('_get_ptg')
@@ -551,99 +1448,208 @@ class deflection:
                 self.tim.add('getSlm')
                 self.tim.close('lengclm ' + 'bwd' * backwards + 'fwd' * (not backwards))
                 return ret
-            if spin == 0:
-                lmax_unl = Alm.getlmax(gclm.size, mmax)
-                points = self.geom.synthesis(gclm, spin, lmax_unl, mmax, self.sht_tr, mode=input_sht_mode)
-                self.tim.add('points synthesis (%s)'%input_sht_mode)
-                if nomagn:
-                    points *= self.dlm2A()
-                    self.tim.add('nomagn')
-            else:
-                assert gclm.ndim == 2, gclm.ndim
-                lmax_unl = Alm.getlmax(gclm[0].size, mmax)
-                if mmax is None:
-                    mmax = lmax_unl
-                pointsc = np.empty((self.geom.npix(),), dtype=np.complex64 if self.single_prec else np.complex128)
-                points = pointsc.view(rtype[pointsc.dtype]).reshape((pointsc.size, 2)).T  # real view onto complex array
-                self.geom.synthesis(gclm, spin, lmax_unl, mmax, self.sht_tr, map=points, mode=input_sht_mode)
-                self.tim.add('points synthesis (%s)'%input_sht_mode)
-                if nomagn:
-                    points *= self.dlm2A()
-                    self.tim.add('nomagn')
-                if spin and polrot:
-                    if HAS_DUCCROTATE:
-                        lensing_rotate(pointsc, self._get_gamma(), -spin, self.sht_tr)
-                        self.tim.add('polrot (ducc)')
-                    elif HAS_FORTRAN:
-                        func = fremap.apply_inplace if pointsc.dtype == np.complex128 else fremap.apply_inplacef
-                        func(pointsc, self._get_gamma(), -spin, self.sht_tr)
-                        self.tim.add('polrot (fortran)')
-                    else:
-                        pointsc *= np.exp((-1j * spin) * self._get_gamma())
-                        self.tim.add('polrot (python)')
-
-            assert points.ndim == 2 and not np.iscomplexobj(points)
-            for ofs, w, nph in zip(self.geom.ofs, self.geom.weight, self.geom.nph):
-                points[:, ofs:ofs + nph] *= w
-            self.tim.add('weighting')
+            points = self._lensgclm_bwd_points(gclm, mmax, spin, nomagn, polrot)
             slm = self.lenmap2gclm(points, spin, lmax_out, mmax_out, sht_mode=out_sht_mode, gclm_out=gclm_out)
             self.tim.close(stri)
             if self.verbosity:
                 print(self.tim)
             return slm
 
-    def dlm2A(self):
+    def lensgclm_many(self, gclms:np.ndarray or list, mmax:int or None, spins:int or list, lmax_out:int,
+                      mmax_out:int or None, backwards=False, nomagn=False, polrot=True, out_sht_mode='STANDARD',
+                      nthreads_sht:int or None=None):
+        """Lenses several fields with the same deflection, pipelining the uniform and non-uniform steps
+
+            The uniform SHT of one field (adjoint_synthesis for forward lensing, synthesis for backward lensing)
+            runs concurrently with the non-uniform step of the next or previous one (gclm2lenmap or lenmap2gclm),
+            each with its own share of the instance threads.
+
+            Args:
+                gclms: list or stack of input alm arrays, as in lensgclm
+                mmax: set this for non-standard mmax != lmax in input arrays
+                spins: spin of each field, or a single spin for all fields
+                lmax_out: desired output arrays lmax
+                mmax_out: desired output arrays mmax (defaults to lmax_out if None)
+                backwards: forward or adjoint (not the same as inverse) lensing operation
+                nomagn(optional): multiplies by the magnification determinant, for inverse lensing (backwards only)
+                polrot(optional): includes small rotation of spin-weighted fields (defaults to True)
+                out_sht_mode(optional): e.g. 'GRAD_ONLY' if only the output gradient modes are desired
+                nthreads_sht(optional): number of threads of the uniform SHTs (defaults to half of the instance threads),
+                                        the non-uniform step using the remaining ones
+
+            Returns:
+                list of output alm arrays, as returned by lensgclm
+
+            Note:
+                If the memory plan uses latitude bands, the fields are lensed one after the other by lensgclm_streamed
+
+        """
+        if self.nbands > 1: # memory plan with latitude bands, no cached pointing: one field at a time
+            spins = [spins] * len(gclms) if np.isscalar(spins) else list(spins)
+            assert len(spins) == len(gclms), (len(spins), len(gclms))
+            return [self.lensgclm_streamed(gclm, mmax, spin, lmax_out, mmax_out, self.mem_plan['band_memory'],
+                                           backwards=backwards, nomagn=nomagn, polrot=polrot, out_sht_mode=out_sht_mode)
+                    for gclm, spin in zip(gclms, spins)]
+        stri = 'lensgclm_many ' + 'bwd' * backwards + 'fwd' * (not backwards)
+        self.tim.start(stri)
+        self.tim.reset()
+        nfields = len(gclms)
+        spins = [spins] * nfields if np.isscalar(spins) else list(spins)
+        assert len(spins) == nfields, (len(spins), nfields)
+        if nomagn:
+            assert backwards
+        if mmax_out is None:
+            mmax_out = lmax_out
+        nthreads_sht = max(1, self.sht_tr // 2) if nthreads_sht is None else nthreads_sht
+        nthreads_nu = max(1, self.sht_tr - nthreads_sht)
+        # Everything that is cached must be built before the two stages can run concurrently
+        self._get_ptg()
+        if polrot and np.any(spins):
+            self._get_gamma()
+        if nomagn:
+            self.dlm2A()
+        self.tim.add('ptg, gamma and magn.')
+        # shallow copies, sharing the cached arrays, with their own threads and timers
+        ffi_sht, ffi_nu = copy.copy(self), copy.copy(self)
+        ffi_sht.sht_tr, ffi_nu.sht_tr = nthreads_sht, nthreads_nu
+        ffi_sht.tim = timer(False, 'uniform stage (%s threads)'%nthreads_sht)
+        ffi_nu.tim = timer(False, 'non-uniform stage (%s threads)'%nthreads_nu)
+        if not backwards:
+            def stage1(k):
+                return ffi_nu.gclm2lenmap(gclms[k], mmax, spins[k], False, polrot=polrot)
+            def stage2(m, k):
+                return self.geom.adjoint_synthesis(m, spins[k], lmax_out, mmax_out, nthreads_sht,
+                                                   mode=out_sht_mode).squeeze()
+        else:
+            def stage1(k):
+                return ffi_sht._lensgclm_bwd_points(gclms[k], mmax, spins[k], nomagn, polrot)
+            def stage2(points, k):
+                return ffi_nu.lenmap2gclm(points, spins[k], lmax_out, mmax_out, sht_mode=out_sht_mode)
+        ret = []
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(stage1, 0)
+            for k in range(nfields):
+                out1 = future.result()
+                if k + 1 < nfields:
+                    future = executor.submit(stage1, k + 1)
+                ret.append(stage2(out1, k))
+                del out1
+        self.tim.add('pipeline (%s fields)'%nfields)
+        self.tim.close(stri)
+        if self.verbosity:
+            print(ffi_sht.tim)
+            print(ffi_nu.tim)
+            print(self.tim)
+        return ret
+
+    def _lensgclm_bwd_points(self, gclm:np.ndarray, mmax:int or None, spin:int, nomagn:bool, polrot:bool):
+        """Uniform part of the backward lensing operation: synthesis, magnification, rotation and weighting
+
+            Returns:
+                quadrature-weighted real (1 or 2, npix) array ready for lenmap2gclm
+
+        """
+        if self.single_prec and gclm.dtype != np.complex64:
+            gclm = gclm.astype(np.complex64)
+            self.tim.add('type conversion')
+        input_sht_mode = ducc_sht_mode(gclm, spin)
+        if spin == 0:
+            lmax_unl = Alm.getlmax(gclm.size, mmax)
+            points = self._fp_gather(self.geom.synthesis(gclm, spin, lmax_unl, mmax, self.sht_tr, mode=input_sht_mode))
+            self.tim.add('points synthesis (%s)'%input_sht_mode)
+            if nomagn:
+                points *= self._fp_gather(self.dlm2A())
+                self.tim.add('nomagn')
+        else:
+            assert gclm.ndim == 2, gclm.ndim
+            lmax_unl = Alm.getlmax(gclm[0].size, mmax)
+            if mmax is None:
+                mmax = lmax_unl
+            pointsc = np.empty((self.geom.npix(),), dtype=np.complex64 if self.single_prec else np.complex128)
+            points = pointsc.view(rtype[pointsc.dtype]).reshape((pointsc.size, 2)).T  # real view onto complex array
+            self.geom.synthesis(gclm, spin, lmax_unl, mmax, self.sht_tr, map=points, mode=input_sht_mode)
+            self.tim.add('points synthesis (%s)'%input_sht_mode)
+            if self._fp_pix is not None:
+                pointsc = pointsc[self._fp_pix]
+                points = pointsc.view(rtype[pointsc.dtype]).reshape((pointsc.size, 2)).T
+            if nomagn:
+                points *= self._fp_gather(self.dlm2A())
+                self.tim.add('nomagn')
+            if spin and polrot:
+                if HAS_DUCCROTATE:
+                    lensing_rotate(pointsc, self._get_gamma(), -spin, self.sht_tr)
+                    self.tim.add('polrot (ducc)')
+                elif HAS_FORTRAN:
+                    func = fremap.apply_inplace if pointsc.dtype == np.complex128 else fremap.apply_inplacef
+                    func(pointsc, self._get_gamma(), -spin, self.sht_tr)
+                    self.tim.add('polrot (fortran)')
+                else:
+                    pointsc *= np.exp((-1j * spin) * self._get_gamma())
+                    self.tim.add('polrot (python)')
+
+        assert points.ndim == 2 and not np.iscomplexobj(points)
+        if self._fp_pix is None:
+            self.geom.apply_weights(points, self.sht_tr)
+        else:
+            points *= self._fp_pgeom.weight
+        self.tim.add('weighting')
+        return points
+
+    def dlm2A(self, geom:Geom=None):
         """Returns determinant of magnification matrix corresponding to input deflection field
 
+            Args:
+                geom(optional): geometry on which to compute the determinant (e.g. a latitude band).
+                                Defaults to the instance geometry, in which case the result is cached
+
             Returns:
                 determinant of magnification matrix. Array of size input pixelization geometry
 
         """
-        #FIXME splits in band with new offsets
+        if geom is not None or not self.cache_magn:
+            return self._dlm2A(self.geom if geom is None else geom)
+        if not self.cacher.is_cached('magn'):
+            self.cacher.cache('magn', self._dlm2A(self.geom))
+        return self.cacher.load('magn')
+
+    def _dlm2A(self, geom:Geom, chunk_size=2 ** 18):
         self.tim.start('dlm2A')
-        geom, lmax, mmax, tr = self.geom, self.lmax_dlm, self.mmax_dlm, self.sht_tr
-        dgclm = np.empty((2, self.dlm.size), dtype=self.dlm.dtype)
+        self.tim.reset()
+        lmax, mmax, tr = self.lmax_dlm, self.mmax_dlm, self.sht_tr
+        has_curl = self.dclm is not None and np.any(self.dclm)
+        dgclm = np.empty((1 + has_curl, self.dlm.size), dtype=self.dlm.dtype)
         dgclm[0] = self.dlm
-        dgclm[1] = np.zeros_like(self.dlm) if self.dclm is None else self.dclm
-        d2k = -0.5 * get_spin_lower(1, self.lmax_dlm)  # For k = 12 \eth^{-1} d, g = 1/2\eth 1d
-        d2g = -0.5 * get_spin_raise(1, self.lmax_dlm) #TODO: check the sign of this one
-        glms = np.empty((2, self.dlm.size), dtype=self.dlm.dtype) # Shear
-        glms[0] = almxfl(dgclm[0], d2g, self.mmax_dlm, False)
-        glms[1] = almxfl(dgclm[1], d2g, self.mmax_dlm, False)
-        klm = almxfl(dgclm[0], d2k, mmax, False)
-        k = geom.synthesis(klm, 0, lmax, mmax, tr)
-        g1, g2 = geom.synthesis(glms, 2, lmax, mmax, tr)
-        d1, d2 = geom.synthesis(dgclm, 1, lmax, mmax, tr)
-        if np.any(dgclm[1]):
-            wlm = almxfl(dgclm[1], d2k, mmax, False)
-            w = geom.synthesis(wlm, 0, lmax, mmax, tr)
-        else:
-            wlm, w = 0., 0.
-        del dgclm, glms, klm, wlm
-        d = np.sqrt(d1 * d1 + d2 * d2)
-        max_d = np.max(d)
-        if max_d > 0:
-            f0 = np.sin(d) / d
-            di = d
-        else:
-            from scipy.special import spherical_jn as jn
-            f0 = jn(0, d)
-            di = np.where(d > 0, d, 1.) # Something I can take the inverse of
-        f1 = np.cos(d) - f0
-        try: #FIXME
-            import numexpr
-            HAS_NUMEXPR = True
-        except:
-            HAS_NUMEXPR = False
+        if has_curl:
+            dgclm[1] = self.dclm
+        mode = 'STANDARD' if has_curl else 'GRAD_ONLY'
+        d2k = -0.5 * get_spin_lower(1, lmax)  # For k = 12 \eth^{-1} d, g = 1/2\eth 1d
+        d2g = -0.5 * get_spin_raise(1, lmax) #TODO: check the sign of this one
+        # convergence and curl together, then shear and deflection:
+        kwlm = np.empty((1 + has_curl, 1, self.dlm.size), dtype=self.dlm.dtype)
+        for i in range(1 + has_curl):
+            kwlm[i, 0] = almxfl(dgclm[i], d2k, mmax, False)
+        kw = geom.synthesis(kwlm, 0, lmax, mmax, tr)[:, 0]
+        del kwlm
+        self.tim.add('synthesis (spin 0, %s trans.)'%(1 + has_curl))
+        g1, g2 = geom.synthesis(np.array([almxfl(gc, d2g, mmax, False) for gc in dgclm]), 2, lmax, mmax, tr, mode=mode)
+        self.tim.add('synthesis (spin 2)')
+        d1, d2 = self._build_d1(geom)
+        del dgclm
+        k = kw[0]
+        w = kw[1] if has_curl else np.zeros(1)
+        A = np.empty(geom.npix(), dtype=float)
         if HAS_NUMEXPR:
-            A = numexpr.evaluate('f0 * ((1. - k) ** 2 - g1 * g1 - g2 * g2 + w * w)')
-            A+= numexpr.evaluate('f1 * (1. - k - ( (d1 * d1 - d2 * d2)  * g1 + (2 * d1 * d2) * g2) / (di * di))')
+            numexpr.set_num_threads(tr)
+            numexpr.evaluate(_dlm2A_kernel, out=A, local_dict={'k':k, 'w':w if has_curl else 0., 'g1':g1, 'g2':g2,
+                                                                  'd1':d1, 'd2':d2}, casting='unsafe')
+            self.tim.add('A (numexpr)')
         else:
-            A  = f0 * ((1. - k) ** 2 - g1 * g1 - g2 * g2 + w * w)
-            A += f1 * (1. - k - ( (d1 * d1 - d2 * d2)  * g1 + (2 * d1 * d2) * g2) / (di * di))
-            #                 -      (   cos 2b * g1 + sin 2b * g2 )
+            for i in range(0, A.size, chunk_size):
+                sli = slice(i, i + chunk_size)
+                A[sli] = _dlm2A_chunk(k[sli], w[sli] if has_curl else 0., g1[sli], g2[sli], d1[sli], d2[sli])
+            self.tim.add('A (numpy)')
         self.tim.close('dlm2A')
-        return A.squeeze()
+        return A
 
     def get_eigamma(self):
         red, imd = self._build_d1()
@@ -662,6 +1668,26 @@ class deflection:
         eig /= np.abs(eig)
         return eig
 
+_dlm2A_kernel = ("where(d1 * d1 + d2 * d2 > 0, sin(sqrt(d1 * d1 + d2 * d2)) / sqrt(d1 * d1 + d2 * d2), 1.)"
+                 " * ((1. - k) ** 2 - g1 * g1 - g2 * g2 + w * w)"
+                 " + where(d1 * d1 + d2 * d2 > 0, (cos(sqrt(d1 * d1 + d2 * d2)) - sin(sqrt(d1 * d1 + d2 * d2)) / sqrt(d1 * d1 + d2 * d2))"
+                 " * (1. - k - ((d1 * d1 - d2 * d2) * g1 + (2 * d1 * d2) * g2) / (d1 * d1 + d2 * d2)), 0.)")
+
+
+def _dlm2A_chunk(k, w, g1, g2, d1, d2):
+    """Magnification determinant from convergence, curl, shear and deflection (numpy version of _dlm2A_kernel)
+
+    """
+    d = np.sqrt(d1 * d1 + d2 * d2)
+    di = np.where(d > 0, d, 1.) # Something I can take the inverse of
+    f0 = np.where(d > 0, np.sin(d) / di, 1.)
+    f1 = np.cos(d) - f0
+    A = f0 * ((1. - k) ** 2 - g1 * g1 - g2 * g2 + w * w)
+    A += f1 * (1. - k - ((d1 * d1 - d2 * d2) * g1 + (2 * d1 * d2) * g2) / (di * di))
+    #                 -      (   cos 2b * g1 + sin 2b * g2 )
+    return A
+
+
 def get_spin_raise(s, lmax):
     r"""Response coefficient of spin-s spherical harmonic to spin raising operator.
 
@@ -20,6 +20,8 @@ if not HAS_DUCCGRADONLY or not HAS_DUCCROTATE:
 # some helper functions
 
 class deflection(deflection_28.deflection):
+    _supports_streaming = True
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
@@ -37,6 +39,7 @@ class deflection(deflection_28.deflection):
         lmax_unl = Alm.getlmax(gclm[0].size, mmax)
         if mmax is None:
             mmax = lmax_unl
+        fp_scatter = ptg is None
         if ptg is None:
             ptg = self._get_ptg()
         assert ptg.shape[-1] == 2, ptg.shape
@@ -46,7 +49,7 @@ class deflection(deflection_28.deflection):
                                        nthreads=self.sht_tr, mode=sht_mode, verbose=self.verbosity)
             self.tim.add('synthesis general (%s)' % sht_mode)
         else:
-            npix = self.geom.npix()
+            npix = ptg.shape[0]
             # This is a trick with two views of the same array to get complex values as output to multiply by the phase
             valuesc = np.empty((npix,), dtype=np.complex64 if self.single_prec else np.complex128)
             values = valuesc.view(np.float32 if self.single_prec else np.float64).reshape((npix, 2)).T
@@ -64,9 +67,10 @@ class deflection(deflection_28.deflection):
         self.tim.close('gclm2lenmap')
         if self.verbosity:
             print(self.tim)
-        return values
+        return self._fp_scatter(values) if fp_scatter else values
 
     def lenmap2gclm(self, points:np.ndarray[float], spin:int, lmax:int, mmax:int, gclm_out=None, sht_mode='STANDARD'):
+        points = self._fp_gather(points)
         assert points.ndim == 2, points.ndim
         assert not np.iscomplexobj(points), (spin, points.ndim, points.dtype)
         self.tim.start('lenmap2gclm')
@@ -81,7 +85,109 @@ class deflection(deflection_28.deflection):
         self.tim.close('lenmap2gclm')
         return ret.squeeze()
 
+    def lensgclm(self, gclm:np.ndarray, mmax:int or None, spin:int, lmax_out:int, mmax_out:int or None,
+                 gclm_out:np.ndarray=None, backwards=False, nomagn=False, polrot=True, out_sht_mode='STANDARD'):
+        if self.nbands > 1: # memory plan with latitude bands
+            return self.lensgclm_streamed(gclm, mmax, spin, lmax_out, mmax_out, self.mem_plan['band_memory'],
+                                          gclm_out=gclm_out, backwards=backwards, nomagn=nomagn, polrot=polrot,
+                                          out_sht_mode=out_sht_mode)
+        return super().lensgclm(gclm, mmax, spin, lmax_out, mmax_out, gclm_out=gclm_out, backwards=backwards,
+                                nomagn=nomagn, polrot=polrot, out_sht_mode=out_sht_mode)
+
+    def lensgclm_streamed(self, gclm:np.ndarray, mmax:int or None, spin:int, lmax_out:int, mmax_out:int or None,
+                          max_memory:float, gclm_out:np.ndarray=None, backwards=False, nomagn=False, polrot=True,
+                          out_sht_mode='STANDARD'):
+        """Same as lensgclm, but processing the sky in latitude bands, in order to cap the memory footprint
+
+            The pointing is built band per band and never cached, and the output alm are accumulated incrementally.
+
+            Args:
+                gclm: input gradient and possibly curl mode ((1 or 2, nalm)-shaped complex numpy.ndarray)
+                mmax: set this for non-standard mmax != lmax in input array
+                spin: spin-weight of the fields (larger or equal 0)
+                lmax_out: desired output array lmax
+                mmax_out: desired output array mmax (defaults to lmax_out if None)
+                max_memory: memory budget in bytes for the position-space arrays of each band
+                gclm_out(optional): output array
+                backwards: forward or adjoint (not the same as inverse) lensing operation
+                nomagn(optional): multiplies by the magnification determinant, for inverse lensing (backwards only)
+                polrot(optional): includes small rotation of spin-weighted fields (defaults to True)
+                out_sht_mode(optional): e.g. 'GRAD_ONLY' if only the output gradient mode is desired
+
+            Note:
+                The alm arrays and the uniform grids internal to the non-uniform SHTs are not part of the budget
+
+        """
+        assert self._fp_pix is None, 'streamed lensing not implemented with footprint'
+        stri = 'lensgclm_streamed ' + 'bwd' * backwards + 'fwd' * (not backwards)
+        self.tim.start(stri)
+        self.tim.reset()
+        gclm = np.atleast_2d(gclm)
+        ctyp = np.complex64 if self.single_prec else np.complex128
+        rtyp = deflection_28.rtype[ctyp]
+        if gclm.dtype != ctyp:
+            gclm = gclm.astype(ctyp)
+            self.tim.add('type conversion')
+        input_sht_mode = deflection_28.ducc_sht_mode(gclm, spin)
+        if nomagn:
+            assert backwards
+        lmax_in = Alm.getlmax(gclm[0].size, mmax)
+        if mmax is None:
+            mmax = lmax_in
+        if mmax_out is None:
+            mmax_out = lmax_out
+        ncomp_out = 1 + (spin != 0) * (out_sht_mode == 'STANDARD')
+        if gclm_out is None:
+            gclm_out = np.zeros((ncomp_out, Alm.getsize(lmax_out, mmax_out)), dtype=ctyp)
+        else:
+            assert gclm_out.dtype == ctyp, 'type precision must match'
+            gclm_out = gclm_out.reshape((ncomp_out, Alm.getsize(lmax_out, mmax_out)))
+            gclm_out[:] = 0.
+        buf = np.empty_like(gclm_out)
+        nbands = int(np.ceil(self.geom.npix() * self._band_bytes_per_pix(spin) / max_memory))
+        bands = self.get_bands(max(nbands, 1))
+        if self.verbosity:
+            print('lensgclm_streamed: %s bands for %.2f GB budget'%(len(bands), max_memory / 1024 ** 3))
+        for band in bands:
+            ptg, gamma = self._deflected_angles(self._build_d1(band), band, calc_rotation=bool(spin and polrot))
+            npix = band.npix()
+            valuesc = np.empty((npix,), dtype=ctyp)
+            values = valuesc.view(rtyp).reshape((npix, 2)).T if spin else np.empty((1, npix), dtype=rtyp)
+            if not backwards:
+                synthesis_general(map=values, lmax=lmax_in, mmax=mmax, alm=gclm, loc=ptg, spin=spin,
+                                  epsilon=self.epsilon, nthreads=self.sht_tr, mode=input_sht_mode, verbose=self.verbosity)
+                self.tim.add('synthesis general (%s)' % input_sht_mode)
+                if spin and polrot:
+                    ducc0.misc.lensing_rotate(valuesc, gamma, spin, self.sht_tr)
+                    self.tim.add('polrot (ducc)')
+                band.adjoint_synthesis(values, spin, lmax_out, mmax_out, self.sht_tr, alm=buf, mode=out_sht_mode)
+                self.tim.add('adjoint_synthesis')
+            else:
+                band.synthesis(gclm, spin, lmax_in, mmax, self.sht_tr, map=values, mode=input_sht_mode)
+                self.tim.add('points synthesis (%s)'%input_sht_mode)
+                if nomagn:
+                    values *= self.dlm2A(band)
+                    self.tim.add('nomagn')
+                if spin and polrot:
+                    ducc0.misc.lensing_rotate(valuesc, gamma, -spin, self.sht_tr)
+                    self.tim.add('polrot (ducc)')
+                band.apply_weights(values, self.sht_tr)
+                self.tim.add('weighting')
+                adjoint_synthesis_general(lmax=lmax_out, mmax=mmax_out, map=values, loc=ptg, spin=spin,
+                                          epsilon=self.epsilon, nthreads=self.sht_tr, mode=out_sht_mode, alm=buf,
+                                          verbose=self.verbosity)
+                self.tim.add('adjoint_synthesis_general (%s)'%out_sht_mode)
+            del ptg, gamma, values, valuesc
+            gclm_out += buf
+        self.tim.close(stri)
+        if self.verbosity:
+            print(self.tim)
+        return gclm_out.squeeze()
+
     def change_dlm(self, dlm:list or np.ndarray, mmax_dlm:int or None, cacher:cachers.cacher or None=None):
         assert len(dlm) == 2, (len(dlm), 'gradient and curl mode (curl can be none)')
         return deflection(self.geom, dlm[0], mmax_dlm, self.sht_tr, cacher, dlm[1],
-                          verbosity=self.verbosity, epsilon=self.epsilon, single_prec=self.single_prec)
+                          verbosity=self.verbosity, epsilon=self.epsilon, single_prec=self.single_prec,
+                          ptg_format=self.ptg_format, planned=self.planned, plan_cache=self.plan_cache,
+                          footprint=self.footprint, max_memory=self.max_memory,
+                          ptg_cache=self.ptg_cache if cacher is None else None)
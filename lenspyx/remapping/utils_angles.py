@@ -78,4 +78,51 @@ def d2ang(red, imd, tht, phi, version, sint_dphi=False):
         if version == 0: # should be calculated already
             sint = np.sqrt(1. - cost * cost)
         return thtp - tht, sint * dphi
-    return thtp, (phi +dphi) % (2. * np.pi)
\ No newline at end of file
+    return thtp, (phi +dphi) % (2. * np.pi)
+
+def d2ang_gamma(red, imd, tht, phi, calc_rotation=True, cis=False):
+    """Vectorized deflected positions and rotation angles, for undeflected positions anywhere on the sphere
+
+        This follows the Eqs. of d2ang (and of the fortran pointing), choosing for each point the most accurate
+        form according to the closest pole or equator
+
+        Args:
+            red: real part of spin-1 deflection field  (~ dtht on the equator)
+            imd: imaginary part of spin-1 deflection field  (~ dphi on the equator)
+            tht: undeflected co-latitudes (same size as red)
+            phi: undeflected longitudes (same size as red)
+            calc_rotation: also returns the rotation angles if set
+            cis: returns the rotation angles as :math:`e^{i\gamma}` instead of :math:`\gamma`, without any arctan
+
+        Returns:
+            deflected co-latitudes and longitudes, and (if calc_rotation) rotation angles or their cis
+
+    """
+    d = np.sqrt(red ** 2 + imd ** 2)
+    sind_d = np.sinc(d * (1. / np.pi)) # sin(d) / d
+    sint = np.sin(tht)
+    version = np.rint(1. - 2. * tht / np.pi)
+    thtp, dphi = np.empty_like(d), np.empty_like(d)
+    eq, no, so = version == 0, version == 1, version == -1
+    # --- 'close' to equator, where cost ~ 0
+    costp = np.cos(tht[eq]) * np.cos(d[eq]) - red[eq] * sind_d[eq] * sint[eq]
+    thtp[eq] = np.arccos(costp)
+    dphi[eq] = np.arcsin(imd[eq] / np.sqrt(1. - costp ** 2) * sind_d[eq])
+    # --- close to the poles, working with 1 -+ cos(t) in order not to lose precision
+    for sli, sgn in [(no, 1.), (so, -1.)]:
+        e_t = 2 * np.sin(tht[sli] * 0.5) ** 2 if sgn > 0 else 2 * np.cos(tht[sli] * 0.5) ** 2
+        e_d = 2 * np.sin(d[sli] * 0.5) ** 2
+        e_tp = e_t + e_d - e_t * e_d + sgn * red[sli] * sind_d[sli] * sint[sli]
+        asintp = np.arcsin(np.sqrt(np.maximum(0., e_tp * (2 - e_tp))))
+        thtp[sli] = asintp if sgn > 0 else np.pi - asintp
+        dphi[sli] = np.arctan2(imd[sli] * sind_d[sli], (1. - e_d) * sint[sli] + sgn * red[sli] * sind_d[sli] * (1. - e_t))
+    phip = (phi + dphi) % (2. * np.pi)
+    if not calc_rotation:
+        return thtp, phip
+    x = d * d * sind_d * (np.cos(tht) / sint) + red * np.cos(d)
+    if not cis:
+        return thtp, phip, np.arctan2(imd, red) - np.arctan2(imd, x)
+    # gamma = arg(red + i imd) - arg(x + i imd)
+    z = (red + 1j * imd) * (x - 1j * imd)
+    az = np.abs(z)
+    return thtp, phip, np.where(az > 0., z / np.where(az > 0., az, 1.), 1.)
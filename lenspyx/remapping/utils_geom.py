@@ -1,5 +1,7 @@
 from __future__ import annotations
 import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from lenspyx import utils_hp
 import ducc0
 from ducc0.misc import GL_thetas, GL_weights
@@ -21,6 +23,62 @@ def st2mmax(spin, tht, lmax):
     return mmax
 
 
+def good_sizes(n:np.ndarray[int], real=True):
+    """Vectorized version of ducc0.fft.good_size
+
+        Args:
+            n: array of (non-negative) integers
+            real: FFT-friendly sizes for real (2, 3, 5-smooth numbers) or else complex FFTs (2, 3, 5, 7, 11-smooth)
+
+        Returns:
+            smallest FFT-friendly integers larger or equal to the input
+
+
+    """
+    n = np.asarray(n, dtype=np.int64)
+    nmax = max(int(np.max(n, initial=0)), 1)
+    sizes = np.array([1], dtype=np.int64) # all smooth numbers up to 2 nmax (there is always one in [nmax, 2 nmax])
+    for p in ([2, 3, 5] if real else [2, 3, 5, 7, 11]):
+        pows = p ** np.arange(int(np.log(2 * nmax) / np.log(p)) + 1, dtype=np.int64)
+        sizes = np.unique(np.outer(sizes, pows))
+        sizes = sizes[sizes <= 2 * nmax]
+    return np.where(n > 0, sizes[np.searchsorted(sizes, n)], 0)
+
+
+_geoms = OrderedDict()
+geom_cache_size = 16 # maximal number of geometries kept by cached_geometry
+
+
+def cached_geometry(name:str, **kwargs):
+    """Shared, read-only geometry instance from the Geom factory name and arguments
+
+        The geometries are memoized, keeping the geom_cache_size most recently used ones
+
+        Args:
+            name: geometry name, e.g. 'healpix' or 'thingauss' (see Geom.get_supported_geometries)
+            kwargs: arguments of the corresponding Geom factory
+
+        Note:
+            The geometry arrays are not writeable, since the instance is shared among all callers
+
+    """
+    key = (name, tuple(sorted(kwargs.items())))
+    if key in _geoms:
+        _geoms.move_to_end(key)
+        return _geoms[key]
+    factory = getattr(Geom, '_'.join(['get', name, 'geometry']), None)
+    assert factory is not None, 'Geometry %s not found, available geometries: '%name + Geom.get_supported_geometries()
+    geom = factory(**kwargs).freeze()
+    _geoms[key] = geom
+    while len(_geoms) > geom_cache_size:
+        _geoms.popitem(last=False)
+    return geom
+
+
+def clear_geometry_cache():
+    _geoms.clear()
+
+
 class Geom:
     def __init__(self, theta:np.ndarray[float], phi0:np.ndarray[float], nphi:np.ndarray[np.uint64], ringstart:np.ndarray[np.uint64], w:np.ndarray[float]):
         """Iso-latitude pixelisation of the sphere
@@ -43,6 +101,16 @@ class Geom:
         self.phi0 = phi0[argsort].astype(np.float64)
         self.nph = nphi[argsort].astype(np.uint64)
         self.ofs = ringstart[argsort].astype(np.uint64)
+        self._ridx = None # rings sorted by ringstart and by co-latitude, for pixel lookups, built on demand
+        self._tidx = None
+
+    def freeze(self):
+        """Makes the geometry arrays read-only, so that the instance can be safely shared
+
+        """
+        for arr in [self.theta, self.weight, self.phi0, self.nph, self.ofs]:
+            arr.flags.writeable = False
+        return self
 
     def npix(self):
         """Number of pixels
@@ -50,6 +118,142 @@ class Geom:
         """
         return int(np.sum(self.nph))
 
+    def _ring_index(self):
+        """Ringstarts in increasing order and the corresponding ring indices, built once and cached
+
+        """
+        if self._ridx is None:
+            isort = np.argsort(self.ofs, kind='stable')
+            self._ridx = (self.ofs[isort].astype(np.int64), isort)
+        return self._ridx
+
+    def _theta_index(self):
+        """Co-latitudes in increasing order and the corresponding ring indices, built once and cached
+
+        """
+        if self._tidx is None:
+            isort = np.argsort(self.theta, kind='stable')
+            self._tidx = (self.theta[isort], isort)
+        return self._tidx
+
+    def pix2ring(self, pix:np.ndarray[int]):
+        """Ring index of map pixels
+
+            Args:
+                pix: map pixel indices (consistent with the ringstarts of the instance)
+
+            Returns:
+                ring indices, with -1 for map pixels not belonging to any of the rings
+
+        """
+        ofs, isort = self._ring_index()
+        pix = np.asarray(pix, dtype=np.int64)
+        i = np.searchsorted(ofs, pix, side='right') - 1
+        rings = isort[np.maximum(i, 0)]
+        inside = (i >= 0) & ((pix - self.ofs[rings].astype(np.int64)) < self.nph[rings].astype(np.int64))
+        return np.where(inside, rings, -1)
+
+    def pix2ang(self, pix:np.ndarray[int]):
+        """Co-latitudes and longitudes of map pixels
+
+            Args:
+                pix: map pixel indices (consistent with the ringstarts of the instance)
+
+            Returns:
+                co-latitudes and longitudes in [0, 2pi) in radians
+
+        """
+        pix = np.asarray(pix, dtype=np.int64)
+        rings = self.pix2ring(pix)
+        assert np.all(rings >= 0), 'pixels outside the geometry'
+        phi = self.phi0[rings] + (pix - self.ofs[rings].astype(np.int64)) * ((2 * np.pi) / self.nph[rings])
+        return self.theta[rings], phi % (2 * np.pi)
+
+    def ang2pix(self, theta:np.ndarray[float], phi:np.ndarray[float]):
+        """Map pixels closest to the input directions
+
+            The pixel is the one with the closest center on the ring closest in co-latitude
+
+            Args:
+                theta: co-latitudes in radians
+                phi: longitudes in radians
+
+            Returns:
+                map pixel indices (consistent with the ringstarts of the instance)
+
+        """
+        ths, isort = self._theta_index()
+        theta, phi = np.broadcast_arrays(np.asarray(theta, dtype=np.float64), np.asarray(phi, dtype=np.float64))
+        if ths.size > 1:
+            i = np.clip(np.searchsorted(ths, theta), 1, ths.size - 1)
+            i = i - ((theta - ths[i - 1]) < (ths[i] - theta))
+        else:
+            i = np.zeros(theta.shape, dtype=np.int64)
+        rings = isort[i]
+        nph = self.nph[rings].astype(np.int64)
+        jphi = np.floor((phi - self.phi0[rings]) * (nph / (2 * np.pi)) + 0.5).astype(np.int64) % nph
+        return self.ofs[rings].astype(np.int64) + jphi
+
+    def _weight_chunks(self, chunk_size:int):
+        """Splits the rings, ordered by ringstart, into chunks of contiguous map pixels of size at most chunk_size
+
+            Rings larger than chunk_size make a chunk of their own
+
+            Returns:
+                list of (first pixel, last pixel + 1, ring indices) tuples, in increasing map order
+
+        """
+        ofs, isort = self._ring_index()
+        nph = self.nph[isort].astype(np.int64)
+        if ofs.size == 0:
+            return []
+        nchunk = (np.cumsum(nph) - nph) // chunk_size
+        brk = np.nonzero((nchunk[1:] != nchunk[:-1]) | (ofs[1:] != ofs[:-1] + nph[:-1]))[0] + 1
+        edges = np.concatenate([[0], brk, [ofs.size]])
+        return [(int(ofs[r0]), int(ofs[r1 - 1] + nph[r1 - 1]), isort[r0:r1]) for r0, r1 in zip(edges[:-1], edges[1:])]
+
+    def apply_weights(self, m:np.ndarray, nthreads:int=1, out:np.ndarray=None, chunk_size=2 ** 18):
+        """Multiplies a map (or a stack of maps) by the quadrature weights, in threaded chunks of rings
+
+            The per-ring weights are expanded to pixels one chunk at a time, so that no map-sized weight array is built
+
+            Args:
+                m: map array, with pixels along the last axis. The map can be larger than the geometry map
+                   (e.g. for sub-geometries with ringstarts referring to a parent map), the pixels outside of the
+                   rings are left unchanged
+                nthreads: number of threads
+                out(optional): output array with the shape of the map, e.g. a reusable buffer.
+                               The map is weighted in place if not set (default)
+
+            Returns:
+                weighted map (the input map if out is None)
+
+        """
+        chunks = self._weight_chunks(chunk_size)
+        npix_map = chunks[-1][1] if len(chunks) else 0
+        assert m.shape[-1] >= npix_map, (m.shape, npix_map)
+        if out is None:
+            out = m
+        assert out.shape == m.shape, (out.shape, m.shape)
+        if out is not m: # pixels outside of the rings
+            p_prev = 0
+            for p0, p1, _ in chunks:
+                if p0 > p_prev:
+                    out[..., p_prev:p0] = m[..., p_prev:p0]
+                p_prev = max(p_prev, p1)
+            out[..., npix_map:] = m[..., npix_map:]
+        def job(chunk):
+            p0, p1, rings = chunk
+            w = self.weight[rings[0]] if rings.size == 1 else np.repeat(self.weight[rings], self.nph[rings].astype(np.int64))
+            np.multiply(m[..., p0:p1], w, out=out[..., p0:p1])
+        if nthreads > 1 and len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=nthreads) as executor: # numpy releases the GIL on large arrays
+                list(executor.map(job, chunks))
+        else:
+            for chunk in chunks:
+                job(chunk)
+        return out
+
     def fsky(self):
         """Fractional area of the sky covered by the pixelization
 
@@ -66,6 +270,7 @@ class Geom:
         if inplace:
             for ar in [self.theta, self.weight, self.phi0, self.nph, self.ofs]:
                 ar[:] = ar[asort]
+            self._ridx, self._tidx = None, None
             return self
         return Geom(self.theta[asort], self.phi0[asort], self.nph[asort], self.ofs[asort], self.weight[asort])
 
@@ -97,19 +302,26 @@ class Geom:
         st = np.sin(tht)
         lmax = ntht - 1
         mmax = np.minimum(np.maximum(st2mmax(spin, tht, lmax), st2mmax(-spin, tht, lmax)), np.ones(ntht) * lmax)
-        nph = np.array([good_size(int(np.ceil(2 * m + 1)), good_size_real) for m in mmax])
+        nph = good_sizes(np.ceil(2 * mmax + 1), good_size_real)
         ir_eq = np.argmax(st) # We force the longitude resolution not to degrade compared to the equator
         dph_eq = 1. / nph[ir_eq]
-        nphi_eq = np.array([good_size(int(np.ceil(stx / dph_eq)), good_size_real) for stx in st])
+        nphi_eq = good_sizes(np.ceil(st / dph_eq), good_size_real)
         nph = np.where((st / nph) > dph_eq, nphi_eq, nph)
         ofs = np.insert(np.cumsum(nph[:-1]), 0, 0)
         return Geom(tht, self.phi0, nph, ofs, self.weight / nph * self.nph)
 
-    def split(self, nbands, verbose=False):
-        """Split the pixelization into chunks
+    def split(self, nbands, verbose=False, balance='uniform', lmax:int or None=None, update_ringstart=False):
+        """Split the pixelization into latitude bands
 
             Args:
-                nbands(int): the colatitude range is uniformly split into 'nbands'
+                nbands(int): desired number of bands (with 'npix' or 'sht', fewer are returned if there are not enough
+                             distinct co-latitudes)
+                verbose(optional): prints some info if set
+                balance(optional): 'uniform' for a uniform split of the colatitude range [0, pi/2] (default),
+                                   'npix' for bands with similar numbers of pixels,
+                                   'sht' for bands with similar estimated SHT cost (see ring_costs)
+                lmax(optional): band-limit for the SHT cost estimate
+                update_ringstart(optional): ringstarts of the bands refer to compact band maps if set
 
             Returns:
                 list of Geom instances
@@ -117,25 +329,86 @@ class Geom:
             Notes:
                 Respects north-south symmetry when present in the instance for faster SHTs
 
-                The ringstarts of the geoms refers to the original full map
+                The ringstarts of the geoms refers to the original full map, unless update_ringstart is set
 
-                There can be some small overlap between bands if the instance co-latitudes exactly match the separation points
+                With 'uniform', there can be some small overlap between bands if the instance co-latitudes exactly
+                match the separation points. The balanced splits never overlap, since the band edges are set in-between
+                distinct co-latitudes
 
         """
-        thts = np.linspace(0., np.pi * 0.5, nbands + 1)
-        th_ls = thts[:-1]
-        th_us = thts[1:]
-        th_ls[0] = 0.
-        th_us[-1] = np.pi * 0.5
-        geoms = []
-        for th_l, th_u in zip(th_ls, th_us):
-            geoms.append(self.restrict(th_l, th_u, True))
+        assert balance in ['npix', 'sht', 'uniform'], balance
+        if balance == 'uniform':
+            edges = np.linspace(0., np.pi * 0.5, nbands + 1)
+        else:
+            u = np.minimum(self.theta, np.pi - self.theta)  # distance to the closest pole
+            isort = np.argsort(u)
+            us, cumcost = u[isort], np.cumsum(self.ring_costs(balance, lmax)[isort])
+            # band edges are set in-between distinct colatitudes, such that no ring (or symmetric pair) can be in two bands
+            igaps = np.where(np.diff(us) > 1e-10)[0]
+            ig = np.unique(np.searchsorted(cumcost[igaps], np.arange(1, nbands) * (cumcost[-1] / nbands)))
+            ig = igaps[ig[ig < igaps.size]]
+            edges = np.concatenate([[0.], 0.5 * (us[ig] + us[ig + 1]), [np.pi * 0.5]])
+        geoms = [self.restrict(th_l, th_u, True, update_ringstart=update_ringstart) for th_l, th_u in zip(edges[:-1], edges[1:])]
         npix = self.npix()
         npix_tot = np.sum([geo.npix() for geo in geoms])
         assert npix_tot >= npix, (npix, npix_tot, 'aaargh')
-        if npix_tot > npix:
-            if verbose:
+        if verbose:
+            if npix_tot > npix:
                 print('(split with overlap, %s additional pixels out of %s)'%(npix_tot-npix, npix))
+            print('split: %s bands with %s pixels'%(len(geoms), [geo.npix() for geo in geoms]))
+        return geoms
+
+    def ring_costs(self, balance='sht', lmax:int or None=None):
+        """Relative cost of each ring in a band split
+
+            Args:
+                balance: 'npix' for the numbers of pixels, 'sht' for the number of m's with non-negligible Legendre
+                         functions at the ring co-latitude (the SHT costs are dominated by the Legendre transforms)
+                lmax(optional): band-limit of the SHTs (defaults to half the largest number of pixels in a ring)
+
+        """
+        if balance == 'npix':
+            return self.nph.astype(float)
+        assert balance == 'sht', balance
+        if lmax is None:
+            lmax = int(np.max(self.nph)) // 2
+        return np.minimum(self.nph.astype(float), 2 * np.minimum(st2mmax(0, self.theta, lmax), lmax) + 1)
+
+    def split_for_workers(self, nworkers:int, balance='sht', lmax:int or None=None, update_ringstart=False,
+                          oversampling=4):
+        """Splits the pixelization into one geometry per worker, with similar costs and no overlap
+
+            The instance is first split into nworkers * oversampling latitude bands, which are then distributed among
+            the workers, largest first, always to the least loaded worker
+
+            Args:
+                nworkers: number of workers
+                balance(optional): 'sht' (default) or 'npix', see split
+                lmax(optional): band-limit for the SHT cost estimate
+                update_ringstart(optional): ringstarts of the geometries refer to compact maps if set,
+                                            otherwise to the instance map (such that workers can fill a shared map)
+                oversampling(optional): number of bands per worker before distribution
+
+            Returns:
+                list of (at most nworkers) Geom instances
+
+        """
+        bands = self.split(nworkers * oversampling, balance=balance, lmax=lmax)
+        costs = [np.sum(band.ring_costs(balance, lmax if lmax is not None else int(np.max(self.nph)) // 2)) for band in bands]
+        loads, members = np.zeros(nworkers), [[] for i in range(nworkers)]
+        for ib in np.argsort(costs)[::-1]:
+            iw = np.argmin(loads)
+            loads[iw] += costs[ib]
+            members[iw].append(bands[ib])
+        geoms = []
+        for bands in members:
+            if len(bands) > 0:
+                tht, phi0, nph, ofs, wt = [np.concatenate([getattr(band, k) for band in bands])
+                                           for k in ['theta', 'phi0', 'nph', 'ofs', 'weight']]
+                if update_ringstart:
+                    isort = np.argsort(ofs)
+                    ofs[isort] = np.insert(np.cumsum(nph[isort][:-1]), 0, 0)
+                geoms.append(Geom(tht, phi0, nph, ofs, wt))
         return geoms
 
     def synthesis(self, gclm: np.ndarray, spin:int, lmax:int, mmax:int, nthreads:int, map:np.ndarray=None, **kwargs):
@@ -157,19 +430,20 @@ class Geom:
         return synthesis_deriv1(alm=alm, theta=self.theta, lmax=lmax, mmax=mmax, nphi=self.nph, phi0=self.phi0,
                          nthreads=nthreads, ringstart=self.ofs, **kwargs)
 
-    def adjoint_synthesis(self, m: np.ndarray, spin:int, lmax:int, mmax:int, nthreads:int, alm=None, apply_weights=True, **kwargs):
+    def adjoint_synthesis(self, m: np.ndarray, spin:int, lmax:int, mmax:int, nthreads:int, alm=None, apply_weights=True,
+                          scratch:np.ndarray=None, **kwargs):
         """Wrapper to ducc backward SHT
 
             Return an array with leading dimension 1 for spin-0 or 2 for spin non-zero
 
             Note:
-                This modifies the input map
+                This modifies the input map, unless a scratch array (of the same shape, e.g. a reusable buffer) is
+                given, in which case the weighted map is written there
 
         """
         m = np.atleast_2d(m)
         if apply_weights:
-            for of, w, npi in zip(self.ofs, self.weight, self.nph):
-                m[:, of:of + npi] *= w
+            m = self.apply_weights(m, nthreads, out=None if scratch is None else scratch.reshape(m.shape))
         if alm is not None:
             assert alm.shape[-1] == utils_hp.Alm.getsize(lmax, mmax)
         return adjoint_synthesis(map=m, theta=self.theta, lmax=lmax, mmax=mmax, nphi=self.nph, spin=spin, phi0=self.phi0,
@@ -183,7 +457,7 @@ class Geom:
     def map2alm_spin(self, m:np.ndarray, spin:int, lmax:int, mmax:int, nthreads:int, zbounds=(-1., 1.), **kwargs):
         # FIXME: method only here for backwards compatiblity
         assert zbounds[0] == -1 and zbounds[1] == 1., zbounds
-        return self.adjoint_synthesis(m.copy(), spin, lmax, mmax, nthreads, **kwargs)
+        return self.adjoint_synthesis(m, spin, lmax, mmax, nthreads, scratch=np.empty(m.shape, dtype=m.dtype), **kwargs)
 
     def alm2map(self, gclm:np.ndarray, lmax:int, mmax:int, nthreads:int, zbounds=(-1., 1.), **kwargs):
         # FIXME: method only here for backwards compatiblity
@@ -193,11 +467,14 @@ class Geom:
     def map2alm(self, m:np.ndarray, lmax:int, mmax:int, nthreads:int, zbounds=(-1., 1.), **kwargs):
         # FIXME: method only here for backwards compatiblity
         assert zbounds[0] == -1 and zbounds[1] == 1., zbounds
-        return self.adjoint_synthesis(m.copy(), 0, lmax, mmax, nthreads, **kwargs).squeeze()
+        return self.adjoint_synthesis(m, 0, lmax, mmax, nthreads, scratch=np.empty(m.shape, dtype=m.dtype), **kwargs).squeeze()
 
     @staticmethod
     def rings2pix(geom:Geom, rings:np.ndarray[int]):
-        return np.concatenate([geom.ofs[ir] + np.arange(geom.nph[ir], dtype=int) for ir in rings])
+        rings = np.asarray(rings, dtype=np.int64)
+        nph = geom.nph[rings].astype(np.int64)
+        # ringstart of the ring of each pixel, plus its position in the ring
+        return np.repeat(geom.ofs[rings].astype(np.int64) - np.cumsum(nph) + nph, nph) + np.arange(np.sum(nph), dtype=np.int64)
 
     @staticmethod
     def phis(geom:Geom, ir):
@@ -207,7 +484,10 @@ class Geom:
 
     @staticmethod
     def rings2phi(geom:Geom, rings:np.ndarray[int]):
-        return np.concatenate([Geom.phis(geom, ir) for ir in rings])
+        rings = np.asarray(rings, dtype=np.int64)
+        nph = geom.nph[rings].astype(np.int64)
+        jphi = np.arange(np.sum(nph), dtype=np.int64) - np.repeat(np.cumsum(nph) - nph, nph) # position in the ring
+        return (np.repeat(geom.phi0[rings], nph) + jphi * np.repeat(2 * np.pi / geom.nph[rings], nph)) % (2. * np.pi)
 
     @staticmethod
     def get_supported_geometries():
@@ -254,7 +534,7 @@ class Geom:
         nlat = tht.size
         phi0 = np.zeros(nlat, dtype=float)
         mmax = np.minimum(np.maximum(st2mmax(smax, tht, lmax), st2mmax(-smax, tht, lmax)), np.ones(nlat) * lmax)
-        nph = np.array([good_size(int(np.ceil(2 * m + 1)), good_size_real) for m in mmax])
+        nph = good_sizes(np.ceil(2 * mmax + 1), good_size_real)
         ofs = np.insert(np.cumsum(nph[:-1]), 0, 0)
         return Geom(tht, phi0, nph, ofs, wt / nph)
 
@@ -384,4 +664,132 @@ class pbdGeometry:
 
         """
         self.geom = geom
-        self.pbound = pbound
\ No newline at end of file
+        self.pbound = pbound
+    def pixels(self):
+        """Indices of the geometry pixels within the longitude bounds, in increasing order
+
+        """
+        rings = np.argsort(self.geom.ofs)
+        pixs = Geom.rings2pix(self.geom, rings)
+        return np.sort(pixs[self.pbound.contains(Geom.rings2phi(self.geom, rings))])
+
+
+class mskGeometry(pbdGeometry):
+    def __init__(self, geom: Geom, mask: np.ndarray):
+        """Geometry restricted to the observed region of a mask, for cut-sky transforms
+
+            The rings without observed pixels are discarded, and the observed pixels of each remaining ring are
+            covered by the shortest run of consecutive pixels (possibly wrapping around phi = 0). The sparse map is
+            the concatenation of these runs, ring after ring.
+
+            Args:
+                geom: parent geometry
+                mask: map on the parent geometry, observed where non-zero
+
+            Attributes:
+                rgeom: geometry of the rings with observed pixels (full rings, with ringstarts referring to a compact
+                       map of these rings), on which the SHTs are performed
+                rings: parent ring index of each ring of rgeom
+                phi0, nph, ofs: longitude of the first pixel, number of pixels and start in the sparse map of each run
+                pbounds: longitude bounds of each run
+                pix: parent map index of each sparse map pixel
+
+            Note:
+                This can be passed as footprint to the deflection instances, whose footprint values are then those
+                of the sparse map
+
+        """
+        mask = np.asarray(mask)
+        assert mask.size == geom.npix(), (mask.size, geom.npix())
+        obs = np.flatnonzero(mask)
+        assert obs.size > 0, 'empty mask'
+        r = geom.pix2ring(obs)
+        assert np.all(r >= 0), 'mask pixels outside the geometry'
+        j = obs - geom.ofs[r].astype(np.int64) # position in the ring
+        isort = np.lexsort((j, r))
+        r, j = r[isort], j[isort]
+        first = np.flatnonzero(np.insert(r[1:] != r[:-1], 0, True))
+        rings = r[first]
+        nph_r = geom.nph[rings].astype(np.int64)
+        # unobserved gap after each observed pixel, up to the next one in the same ring
+        j_next = np.empty_like(j)
+        j_next[:-1] = j[1:]
+        j_next[np.append(first[1:], j.size) - 1] = j[first] + nph_r
+        gaps = j_next - j
+        gmax = np.maximum.reduceat(gaps, first)
+        # the runs start right after the largest gap of each ring
+        ilarge = np.flatnonzero(gaps == np.repeat(gmax, np.diff(np.append(first, j.size))))
+        ilarge = ilarge[np.unique(r[ilarge], return_index=True)[1]]
+        nrun = nph_r - gmax + 1
+        jstart = np.where(nrun == nph_r, 0, j_next[ilarge] % nph_r)
+
+        rofs = np.insert(np.cumsum(nph_r)[:-1], 0, 0)
+        dphi = 2 * np.pi / nph_r
+        self.rgeom = Geom(geom.theta[rings], geom.phi0[rings], nph_r, rofs, geom.weight[rings])
+        self.rings = rings
+        self.phi0 = (geom.phi0[rings] + jstart * dphi) % (2 * np.pi)
+        self.nph = nrun
+        self.ofs = np.insert(np.cumsum(nrun)[:-1], 0, 0)
+        self.pbounds = [pbounds(p0 + 0.5 * (n - 1) * dp, n * dp) for p0, n, dp in zip(self.phi0, nrun, dphi)]
+        # position of each run pixel in its ring, and in the rings and parent maps
+        jrun = (np.repeat(jstart - self.ofs, nrun) + np.arange(np.sum(nrun), dtype=np.int64)) % np.repeat(nph_r, nrun)
+        self._rpix = np.repeat(rofs, nrun) + jrun
+        self.pix = np.repeat(geom.ofs[rings].astype(np.int64), nrun) + jrun
+        # longitude bounds of the observed region, starting after the largest longitude gap between observed pixels
+        phis = np.sort(geom.pix2ang(obs)[1])
+        gaps = np.diff(np.append(phis, phis[0] + 2 * np.pi))
+        ig = np.argmax(gaps)
+        prange = 2 * np.pi - gaps[ig] + np.max(dphi)
+        super().__init__(geom, pbounds(phis[(ig + 1) % phis.size] + 0.5 * (prange - np.max(dphi)), prange))
+
+    def npix(self):
+        """Number of pixels of the sparse map
+
+        """
+        return self.pix.size
+
+    def fsky(self):
+        """Fractional area of the sky covered by the runs
+
+        """
+        return np.sum(self.rgeom.weight * self.nph) / (4 * np.pi)
+
+    def pixels(self):
+        """Parent map indices of the sparse map pixels, in the sparse map order
+
+        """
+        return self.pix
+
+    def from_parent(self, m:np.ndarray):
+        """Extracts the sparse map from a map (or stack of maps) on the parent geometry
+
+        """
+        return m[..., self.pix]
+
+    def to_parent(self, m:np.ndarray, fill=0.):
+        """Sparse map (or stack of maps) onto the parent geometry, with fill values outside of the runs
+
+        """
+        ret = np.full(m.shape[:-1] + (self.geom.npix(),), fill, dtype=m.dtype)
+        ret[..., self.pix] = m
+        return ret
+
+    def synthesis(self, gclm: np.ndarray, spin:int, lmax:int, mmax:int, nthreads:int, **kwargs):
+        """Wrapper to ducc forward SHT, on the rings with observed pixels only
+
+            Return an array with leading dimension 1 for spin-0 or 2 for spin non-zero, and the sparse map pixels
+
+        """
+        return self.rgeom.synthesis(gclm, spin, lmax, mmax, nthreads, **kwargs)[:, self._rpix]
+
+    def adjoint_synthesis(self, m: np.ndarray, spin:int, lmax:int, mmax:int, nthreads:int, alm=None, apply_weights=True,
+                          **kwargs):
+        """Wrapper to ducc backward SHT of a sparse map, on the rings with observed pixels only
+
+            Return an array with leading dimension 1 for spin-0 or 2 for spin non-zero
+
+        """
+        m = np.atleast_2d(m)
+        rm = np.zeros((m.shape[0], self.rgeom.npix()), dtype=m.dtype)
+        rm[:, self._rpix] = m
+        return self.rgeom.adjoint_synthesis(rm, spin, lmax, mmax, nthreads, alm=alm, apply_weights=apply_weights, **kwargs)
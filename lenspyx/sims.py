@@ -3,10 +3,13 @@
 """
 
 import numpy as np
+from os import cpu_count
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from plancklens.sims import cmbs
 from lenspyx import utils_hp
 from lenspyx.remapping.deflection import deflection
-from lenspyx.remapping.utils_geom import Geom
+from lenspyx.remapping.utils_geom import cached_geometry
 from lenspyx import cachers
 
 class sims_cmb_len(object):
@@ -18,6 +21,11 @@ class sims_cmb_len(object):
             offsets_plm: offset lensing plm simulation index (useful e.g. for MCN1), tuple with block_size and offsets
             offsets_cmbunl: offset unlensed cmb (useful e.g. for MCN1), tuple with block_size and offsets
             dlmax(defaults to 1024): unlensed cmbs are produced up to lmax + dlmax, for accurate lensing at lmax
+            numthreads(defaults to 0): number of threads of the lensing operations (0 uses all available)
+            ffi_cache_size(defaults to 1): number of deflection instances (with their pointing) kept in memory,
+                                           such that the fields of the same index are lensed with the same one.
+                                           The pointing of the last simulations then stays in memory after the
+                                           calls, until freed with 'invalidate' (or set this to 0)
 
 
         Note:
@@ -27,7 +35,8 @@ class sims_cmb_len(object):
     """
     def __init__(self, lmax_len:int, cmb_unl:cmbs.sims_cmb_unl,
                  cache:cachers.cacher or None=None, offsets_plm:tuple or None=None, offsets_cmbunl:tuple or None=None,
-                 dlmax:int=1024, dlmax_gl:int=1024, epsilon:float=1e-5, verbosity=0):
+                 dlmax:int=1024, dlmax_gl:int=1024, epsilon:float=1e-5, verbosity=0, numthreads:int=0,
+                 ffi_cache_size:int=1):
 
         if cache is None:  # Will not save the lensed unless this is set
             cache = cachers.cacher_none()
@@ -40,6 +49,7 @@ class sims_cmb_len(object):
         # ducc0 parameters:
         self.epsilon = epsilon
         self.verbosity = verbosity
+        self.numthreads = numthreads
 
         self.unlcmbs = cmb_unl
         self.fields = cmb_unl.fields
@@ -49,6 +59,14 @@ class sims_cmb_len(object):
 
         self.cacher = cache
 
+        self.ffi_cache_size = ffi_cache_size
+        self._ffis = OrderedDict()
+
+    def __getstate__(self):
+        # deflection instances are not sent to other processes
+        state = self.__dict__.copy()
+        state['_ffis'] = OrderedDict()
+        return state
 
     @staticmethod
     def offset_index(idx, block_size, offset):
@@ -97,12 +115,28 @@ class sims_cmb_len(object):
         return dlm, dclm, lmax_dlm, mmax_dlm
 
     def _get_f(self, idx):
+        if idx in self._ffis:
+            self._ffis.move_to_end(idx)
+            return self._ffis[idx]
         dlm, dclm, lmax_dlm, mmax_dlm = self._get_dlm(idx)
-        lenjob_geometry = Geom.get_thingauss_geometry(self.lmax_unl + self.dlmax_gl, 2)
-        f = deflection(lenjob_geometry, dlm, mmax_dlm, cacher=cachers.cacher_mem(safe=False), dclm=dclm,
-                       epsilon=self.epsilon, verbosity=self.verbosity)
+        geom = cached_geometry('thingauss', lmax=self.lmax_unl + self.dlmax_gl, smax=2)
+        f = deflection(geom, dlm, mmax_dlm, numthreads=self.numthreads, cacher=cachers.cacher_mem(safe=False),
+                       dclm=dclm, epsilon=self.epsilon, verbosity=self.verbosity)
+        if self.ffi_cache_size > 0:
+            while len(self._ffis) >= self.ffi_cache_size:
+                self._ffis.popitem(last=False)
+            self._ffis[idx] = f
         return f
 
+    def invalidate(self, idx:int or None=None):
+        """Removes the deflection instance of simulation idx from memory (all of them if idx is None)
+
+        """
+        if idx is None:
+            self._ffis.clear()
+        elif idx in self._ffis:
+            del self._ffis[idx]
+
     def get_sim_tlm(self, idx):
         fname ='sim_%04d_tlm'%idx
         if not self.cacher.is_cached(fname):
@@ -113,24 +147,94 @@ class sims_cmb_len(object):
             return tlm
         return self.cacher.load(fname)
 
+    def _get_unl_eblm(self, idx):
+        idx_cmb = self.offset_index(idx, self.offset_cmb[0], self.offset_cmb[1])
+        if 'b' not in self.fields:
+            return np.atleast_2d(self.unlcmbs.get_sim_elm(idx_cmb))
+        eblm = np.empty((2, utils_hp.Alm.getsize(self.lmax_unl, self.lmax_unl)), dtype=complex)
+        eblm[0] = self.unlcmbs.get_sim_elm(idx_cmb)
+        eblm[1] = self.unlcmbs.get_sim_blm(idx_cmb)
+        return eblm
+
     def get_sim_eblm(self, idx):
         fneb ='sim_%04d_eblm'%idx
         if not self.cacher.is_cached(fneb):
             f = self._get_f(idx)
-            if 'b' not in self.fields:
-                elm = self.unlcmbs.get_sim_elm(self.offset_index(idx, self.offset_cmb[0], self.offset_cmb[1]))
-                eblm = f.lensgclm(np.atleast_2d(elm), self.lmax_unl, 2, self.lmax, self.lmax)
-            else:
-                eblm = np.empty((2, utils_hp.Alm.getsize(self.lmax_unl, self.lmax_unl)), dtype=complex)
-                eblm[0] = self.unlcmbs.get_sim_elm(self.offset_index(idx, self.offset_cmb[0], self.offset_cmb[1]))
-                eblm[1] = self.unlcmbs.get_sim_blm(self.offset_index(idx, self.offset_cmb[0], self.offset_cmb[1]))
-                eblm = f.lensgclm(eblm, self.lmax_unl, 2, self.lmax, self.lmax)
+            eblm = f.lensgclm(self._get_unl_eblm(idx), self.lmax_unl, 2, self.lmax, self.lmax)
             self.cacher.cache('sim_%04d_eblm' % idx, eblm)
             return eblm
         return self.cacher.load(fneb)
 
+    def get_sim_teblm(self, idx):
+        """Returns lensed temperature and polarization alm of simulation idx, lensed against one single pointing
+
+            Returns:
+                tlm and (1 or 2, nalm) eblm arrays
+
+        """
+        fnt, fneb = 'sim_%04d_tlm'%idx, 'sim_%04d_eblm'%idx
+        if self.cacher.is_cached(fnt) and self.cacher.is_cached(fneb):
+            return self.cacher.load(fnt), self.cacher.load(fneb)
+        if self.cacher.is_cached(fnt):
+            return self.cacher.load(fnt), self.get_sim_eblm(idx)
+        if self.cacher.is_cached(fneb):
+            return self.get_sim_tlm(idx), self.cacher.load(fneb)
+        f = self._get_f(idx)
+        tlm = self.unlcmbs.get_sim_tlm(self.offset_index(idx, self.offset_cmb[0], self.offset_cmb[1]))
+        tlm, eblm = f.lensgclm_many([tlm, self._get_unl_eblm(idx)], self.lmax_unl, [0, 2], self.lmax, self.lmax)
+        self.cacher.cache(fnt, tlm)
+        self.cacher.cache(fneb, eblm)
+        return tlm, eblm
+
+    def _lens_teb(self, idx):
+        """Lenses and caches the missing temperature and polarization of simulation idx, using one deflection instance
+
+        """
+        self.get_sim_teblm(idx)
+        self.invalidate(idx)
+
+    def prefetch(self, indices:list or np.ndarray, nworkers:int=1):
+        """Generates and caches the lensed simulations of the given indices, farmed out to a pool of processes
+
+            Each worker builds the deflection once per index and lenses all fields with it.
+
+            Args:
+                indices: simulation indices
+                nworkers: number of processes. Each gets an equal share of the available threads
+
+            Note:
+                The results are written through the cacher, which must then be accessible to all processes (e.g. cacher_npy)
+
+        """
+        assert not isinstance(self.cacher, (cachers.cacher_none, cachers.cacher_mem)), 'need a cacher shared between processes'
+        todo = [idx for idx in indices if not (self.cacher.is_cached('sim_%04d_tlm'%idx)
+                                               and self.cacher.is_cached('sim_%04d_eblm'%idx))]
+        if nworkers <= 1 or len(todo) <= 1:
+            for idx in todo:
+                self._lens_teb(idx)
+            return
+        numthreads = self.numthreads
+        self.numthreads = max(1, (cpu_count() if numthreads <= 0 else numthreads) // nworkers)
+        try:
+            with ProcessPoolExecutor(max_workers=nworkers) as executor:
+                for _ in executor.map(_lens_teb, [self] * len(todo), todo):
+                    pass
+        finally:
+            self.numthreads = numthreads
+
+    def generate_range(self, idx_min:int, idx_max:int, nworkers:int=1):
+        """Generates and caches the lensed simulations with indices idx_min to idx_max (excluded), see prefetch
+
+        """
+        self.prefetch(range(idx_min, idx_max), nworkers=nworkers)
+
     def get_sim_elm(self, idx):
         return self.get_sim_eblm(idx)[0]
 
     def get_sim_blm(self, idx):
         return self.get_sim_eblm(idx)[1]
+
+
+def _lens_teb(sims:sims_cmb_len, idx:int):
+    # process pool worker
+    sims._lens_teb(idx)
@@ -0,0 +1,33 @@
+"""Tests the autotuned deflection: both engine decisions must give the same results, with the same output shapes
+
+"""
+import os
+import tempfile
+import numpy as np
+from lenspyx.tests.helper import syn_alms, syn_ffi
+from lenspyx.remapping import autotune
+
+lmax = 128
+with tempfile.TemporaryDirectory() as lib_dir:
+    tune_cache = autotune.engine_cache(os.path.join(lib_dir, 'autotune.json'))
+    for planned in [False, True]:
+        ffi, geom = syn_ffi(lmax, engine=autotune.deflection, tune_cache=tune_cache, planned=planned)
+        for spin in [0, 2]:
+            gclm = np.atleast_2d(syn_alms(spin, lmax))
+            # probed decision, stored on disk
+            best = ffi.best_engine('gclm2lenmap', lmax, spin)
+            assert tune_cache.get(ffi._tune_key('gclm2lenmap', lmax, spin)) == best
+            print('planned %s, spin %s: probe picked %s'%(planned, spin, best))
+            rets = {}
+            for name in autotune.engines:
+                for op in ['gclm2lenmap', 'lenmap2gclm']:
+                    tune_cache.set(ffi._tune_key(op, lmax, spin), name)
+                f = syn_ffi(lmax, geom=geom, dlm=ffi.dlm, engine=autotune.deflection, tune_cache=tune_cache,
+                            planned=planned)[0]
+                lenmap = f.gclm2lenmap(gclm, None, spin, False)
+                rets[name] = (lenmap, f.lenmap2gclm(lenmap.copy(), spin, lmax, lmax))
+            for a, b in zip(rets['028'], rets['029']):
+                assert a.shape == b.shape, (a.shape, b.shape)
+                dev = np.max(np.abs(a - b)) / np.max(np.abs(a))
+                print('  028 vs 029 max. rel. dev. %.2e'%dev)
+                assert dev < 1e-8, dev
@@ -0,0 +1,30 @@
+"""Tests the gradient of the remapped fields with respect to the deflection alms against finite differences
+
+"""
+import numpy as np
+from lenspyx.tests.helper import syn_alms, syn_dlm, syn_ffi
+
+lmax = 64
+rng = np.random.default_rng(42)
+dlm, dclm = syn_dlm(lmax), 0.3 * syn_dlm(lmax)
+ddlm, ddclm = syn_dlm(lmax), syn_dlm(lmax)
+
+def get_ffi(dglm, dclm):
+    return syn_ffi(lmax, 40, dlm=dglm, dclm=dclm, epsilon=1e-13)[0]
+
+def dot(alm1, alm2): # real scalar product consistent with ducc adjoint_synthesis
+    return np.sum(alm1[:lmax + 1].real * alm2[:lmax + 1].real) + 2 * np.sum((alm1[lmax + 1:] * np.conj(alm2[lmax + 1:])).real)
+
+maxdev = 0.
+for spin in [0, 1, 2]:
+    gclm = np.atleast_2d(syn_alms(spin, lmax))
+    ffi = get_ffi(dlm, dclm)
+    residual = rng.standard_normal(np.atleast_2d(ffi.gclm2lenmap(gclm, None, spin, False)).shape)
+    grad = ffi.lenmap2dlm(residual, gclm, None, spin)
+    h = 1e-3
+    phis = [np.sum(residual * get_ffi(dlm + e * ddlm, dclm + e * ddclm).gclm2lenmap(gclm, None, spin, False)) for e in [h, -h]]
+    fd = (phis[0] - phis[1]) / (2 * h)
+    dev = np.abs((dot(grad[0], ddlm) + dot(grad[1], ddclm)) / fd - 1.)
+    print('spin %s: finite differences vs gradient relative deviation %.2e'%(spin, dev))
+    maxdev = max(maxdev, dev)
+assert maxdev < 1e-6, maxdev
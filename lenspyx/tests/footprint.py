@@ -0,0 +1,43 @@
+"""Tests the footprint mode against full-sky lensing, on the footprint pixels
+
+"""
+import numpy as np
+from lenspyx.tests.helper import syn_alms, syn_ffi, duccd28, duccd29
+from lenspyx.remapping.utils_geom import pbdGeometry, pbounds
+
+lmax = 128
+ffi, geom = syn_ffi(lmax)
+tht, phi = geom.pix2ang(np.arange(geom.npix()))
+pbgeom = pbdGeometry(geom, pbounds(1., 2.))
+footprints = {'mask': (tht > 0.5) & (tht < 1.5), 'pbdGeometry': pbgeom}
+masks = {'mask': footprints['mask'], 'pbdGeometry': pbgeom.pbound.contains(phi)}
+
+def dev(a, b):
+    return np.max(np.abs(a - b)) / np.max(np.abs(b))
+
+maxdev = 0.
+for engine in [duccd28, duccd29]:
+    ffi_full = syn_ffi(lmax, geom=geom, dlm=ffi.dlm, engine=engine)[0]
+    for name, footprint in footprints.items():
+        mask = masks[name]
+        ffi_fp = syn_ffi(lmax, geom=geom, dlm=ffi.dlm, engine=engine, footprint=footprint)[0]
+        for spin in [0, 2]:
+            gclm = np.atleast_2d(syn_alms(spin, lmax))
+            devs = []
+            # deflected maps, zero outside of the footprint
+            ref = np.atleast_2d(ffi_full.gclm2lenmap(gclm, None, spin, False))
+            lenmap = np.atleast_2d(ffi_fp.gclm2lenmap(gclm, None, spin, False))
+            assert np.all(lenmap[:, ~mask] == 0.)
+            devs.append(dev(lenmap[:, mask], ref[:, mask]))
+            # adjoint, from full maps or from footprint values
+            ref = ffi_full.lenmap2gclm(ref * mask, spin, lmax, lmax)
+            devs.append(dev(ffi_fp.lenmap2gclm(lenmap.copy(), spin, lmax, lmax), ref))
+            devs.append(dev(ffi_fp.lenmap2gclm(lenmap[:, mask].copy(), spin, lmax, lmax), ref))
+            # backward lensing
+            points = ffi_full._lensgclm_bwd_points(gclm, None, spin, False, True)
+            ref = ffi_full.lenmap2gclm(points * mask, spin, lmax, lmax)
+            devs.append(dev(ffi_fp.lensgclm(gclm, None, spin, lmax, None, backwards=True), ref))
+            print('%s, %s, spin %s: max. rel. devs. '%(engine.__module__.split('.')[-1], name, spin)
+                  + ' '.join(['%.2e'%d for d in devs]))
+            maxdev = max(maxdev, np.max(devs))
+assert maxdev < 1e-8, maxdev
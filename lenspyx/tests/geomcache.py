@@ -0,0 +1,46 @@
+"""Tests the memoized geometries and the vectorized FFT-friendly sizes
+
+"""
+import numpy as np
+import ducc0
+from lenspyx.remapping import utils_geom
+from lenspyx.lensing import get_geom
+
+# good_sizes against ducc0.fft.good_size
+n = np.arange(1, 40000)
+for real in [True, False]:
+    ref = np.array([ducc0.fft.good_size(int(i), real) for i in n])
+    assert np.all(utils_geom.good_sizes(n, real) == ref), real
+    assert np.all(utils_geom.good_sizes(n[::-1], real) == ref[::-1]), real
+assert utils_geom.good_sizes(np.array([0]))[0] == 0
+
+# memoization: identical arguments return the same, read-only, instance
+utils_geom.clear_geometry_cache()
+g1 = utils_geom.cached_geometry('thingauss', lmax=128, smax=2)
+assert utils_geom.cached_geometry('thingauss', smax=2, lmax=128) is g1
+assert utils_geom.cached_geometry('thingauss', lmax=130, smax=2) is not g1
+for arr in [g1.theta, g1.weight, g1.phi0, g1.nph, g1.ofs]:
+    assert not arr.flags.writeable
+refused = False
+try:
+    g1.theta[0] = 0.
+except ValueError:
+    refused = True
+assert refused
+utils_geom.clear_geometry_cache()
+assert utils_geom.cached_geometry('thingauss', lmax=128, smax=2) is not g1
+
+# bounded cache size
+for lmax in range(16, 16 + utils_geom.geom_cache_size + 1):
+    utils_geom.cached_geometry('gl', lmax=lmax)
+assert len(utils_geom._geoms) == utils_geom.geom_cache_size
+
+# lensing.get_geom returns writeable copies of the shared instance
+geom = get_geom(('thingauss', {'lmax':128, 'smax':2}))
+shared = utils_geom.cached_geometry('thingauss', lmax=128, smax=2)
+assert geom is not shared and geom.theta.flags.writeable
+for a, b in zip([geom.theta, geom.weight, geom.phi0, geom.nph, geom.ofs],
+                [shared.theta, shared.weight, shared.phi0, shared.nph, shared.ofs]):
+    assert np.all(a == b)
+geom.theta[0] = 0.
+assert shared.theta[0] != 0.
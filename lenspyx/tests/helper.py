@@ -1,5 +1,6 @@
 import os
 import numpy as np
+from multiprocessing import cpu_count
 import lenspyx
 from lenspyx.utils import camb_clfile
 from lenspyx.utils_hp import Alm
@@ -34,12 +35,30 @@ def syn_alms(spin, lmax_unl=5120, ctyp=np.complex128):
 def syn_dlm(lmax_unl=5120, ctyp=np.complex128):
     mmax_unl = lmax_unl
     rtyp = lenspyx.remapping.deflection_028.rtype[ctyp]
-    cdd = _extend_cl(cls_unl['pp'][:lmax_unl + 1], lmax_unl)
-    cdd *= np.arange(lmax_unl + 1) * np.arange(1, lmax_unl + 2)
+    # (not in place, since _extend_cl can return a view of cls_unl)
+    cdd = _extend_cl(cls_unl['pp'][:lmax_unl + 1], lmax_unl) * (np.arange(lmax_unl + 1) * np.arange(1, lmax_unl + 2))
     return synalm(cdd, lmax_unl, mmax_unl, rlm_dtype=rtyp)
 
 
 
+def syn_ffi(lmax=128, dlmax_gl=64, dclm_fac=0., engine=duccd29, geom=None, dlm=None, dclm=None, **kwargs):
+    """Returns small, accurate deflection instance for the tests, with LCDM deflection (and curl scaled by dclm_fac)
+
+        The geometry defaults to thingauss with band-limit lmax + dlmax_gl. Other keyword arguments are passed on to
+        the deflection instance, overriding the test defaults (double precision, epsilon 1e-10, memory cacher)
+
+    """
+    if dlm is None:
+        dlm = syn_dlm(lmax)
+    if dclm is None and dclm_fac:
+        dclm = dclm_fac * syn_dlm(lmax)
+    if geom is None:
+        geom = utils_geom.Geom.get_thingauss_geometry(lmax + dlmax_gl, 2)
+    opts = {'numthreads':min(4, cpu_count()), 'epsilon':1e-10, 'single_prec':False, 'verbosity':0,
+            'cacher':cachers.cacher_mem(safe=False)}
+    opts.update(kwargs)
+    return engine(geom, dlm, None, dclm=dclm, **opts), geom
+
 def syn_ffi_ducc(lmax_len = 4096, dlmax=1024, epsilon=1e-5, dlm_fac=1., nthreads=0, dlmax_gl=1024, verbosity=1, planned=False):
     """"Returns realistic LCDM deflection field scaled by dlm_fac
 
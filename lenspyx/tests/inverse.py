@@ -0,0 +1,31 @@
+"""Tests the inverse deflection: deflecting the inverse-deflected points must land back on the grid
+
+"""
+import numpy as np
+import ducc0
+from lenspyx.tests.helper import syn_ffi
+from ducc0.sht.experimental import synthesis_general
+
+lmax = 200
+ffi, geom = syn_ffi(lmax, 100)
+dlm, nthreads = ffi.dlm, ffi.sht_tr
+npix = geom.npix()
+tht, phi = geom.pix2ang(np.arange(npix))
+
+def get_err(ffi_inv):
+    ptg = ffi_inv._get_ptg()
+    d = synthesis_general(lmax=lmax, mmax=lmax, alm=np.array([dlm, np.zeros_like(dlm)]), loc=ptg, spin=1,
+                          epsilon=1e-10, nthreads=nthreads)
+    ptg_back = ducc0.misc.get_deflected_angles(theta=ptg[:, 0].copy(), phi0=ptg[:, 1].copy(),
+                                               nphi=np.ones(npix, dtype=np.uint64), ringstart=np.arange(npix, dtype=np.uint64),
+                                               deflect=d.T, calc_rotation=False, nthreads=nthreads)
+    dphi = (ptg_back[:, 1] - phi + np.pi) % (2 * np.pi) - np.pi
+    return np.max(np.sqrt((ptg_back[:, 0] - tht) ** 2 + (np.sin(tht) * dphi) ** 2))
+
+err = get_err(ffi.inverse())
+print('max. angular error after deflection of inverse-deflected points (rad): %.2e'%err)
+assert err < 1e-12, err
+# the best iterate is returned, so that more iterations never make things worse
+errs = [get_err(ffi.inverse(niter_max=niter)) for niter in [0, 1, 2]]
+print('errors after 0, 1, 2 iterations: %.2e %.2e %.2e'%tuple(errs))
+assert errs[0] >= errs[1] >= errs[2] >= err, errs
@@ -0,0 +1,32 @@
+"""Tests the lensed beam convolution with a pencil beam against the deflected maps and detector samples
+
+"""
+import numpy as np
+from lenspyx.tests.helper import syn_alms, syn_ffi
+from lenspyx.utils_hp import Alm
+from lenspyx.utils import blm_gauss
+
+lmax, kmax = 128, 2
+ffi, geom = syn_ffi(lmax, dclm_fac=0.3)
+teb = np.concatenate([np.atleast_2d(syn_alms(0, lmax)), syn_alms(2, lmax)])
+# pencil beam, normalized for ducc0.totalconvolve to return T + Q cos 2psi + U sin 2psi
+blm = np.zeros((3, Alm.getsize(lmax, kmax)), dtype=complex)
+blm[0, :lmax + 1] = blm_gauss(0., lmax, 0)[0]
+blm[1:] = -np.sqrt(2.) * blm_gauss(0., lmax, 2)
+
+psi = np.random.default_rng(0).uniform(0., 2 * np.pi, geom.npix())
+T = np.atleast_2d(ffi.gclm2lenmap(teb[0], None, 0, False))[0]
+Q, U = ffi.gclm2lenmap(teb[1:], None, 2, False)
+ref = T + Q * np.cos(2 * psi) + U * np.sin(2 * psi)
+conv = ffi.convolve2lenmap(teb, blm, kmax, psi=psi)[0]
+dev = np.max(np.abs(conv - ref)) / np.max(np.abs(ref))
+print('convolve2lenmap: max. rel. dev. %.2e'%dev)
+assert dev < 1e-8, dev
+
+pixs = np.arange(0, geom.npix(), 7)
+tht, phi = geom.pix2ang(pixs)
+chunks = [(tht[i:i + 1000], phi[i:i + 1000], psi[pixs][i:i + 1000]) for i in range(0, pixs.size, 1000)]
+tod = np.concatenate([v[0] for v in ffi.convolve2lentod(teb, blm, kmax, chunks)])
+dev = np.max(np.abs(tod - ref[pixs])) / np.max(np.abs(ref))
+print('convolve2lentod: max. rel. dev. %.2e'%dev)
+assert dev < 1e-8, dev
@@ -0,0 +1,20 @@
+"""Tests the remapping of a few pixels, without the pointing of the full geometry, against the deflected maps
+
+"""
+import numpy as np
+from lenspyx.tests.helper import syn_alms, syn_ffi
+
+lmax = 128
+ffi, geom = syn_ffi(lmax, dclm_fac=0.3)
+ffi_ref = syn_ffi(lmax, geom=geom, dlm=ffi.dlm, dclm=ffi.dclm)[0]
+pixs = np.random.default_rng(0).integers(0, geom.npix(), 100)
+for spin in [0, 2]:
+    gclm = np.atleast_2d(syn_alms(spin, lmax))
+    vals = np.atleast_2d(ffi.gclm2lenpixs(gclm, None, spin, pixs))
+    assert not ffi.cacher.is_cached('ptg') and not ffi.cacher.is_cached('gamma'), 'full pointing was built'
+    ref = np.atleast_2d(ffi_ref.gclm2lenmap(gclm, None, spin, False))[:, pixs]
+    dev = np.max(np.abs(vals - ref)) / np.max(np.abs(ref))
+    print('spin %s: max. rel. dev. %.2e'%(spin, dev))
+    assert dev < 1e-8, dev
+    # once the pointing is cached, it is used
+    assert np.max(np.abs(np.atleast_2d(ffi_ref.gclm2lenpixs(gclm, None, spin, pixs)) - ref)) / np.max(np.abs(ref)) < 1e-8
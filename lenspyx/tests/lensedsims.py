@@ -0,0 +1,94 @@
+"""Tests the lensed CMB simulation library: joint and process-parallel generation against serial generation,
+    and the deflection instances kept in memory
+
+    (needs plancklens)
+
+"""
+import sys
+import tempfile
+import numpy as np
+from lenspyx.tests.helper import cls_unl
+from lenspyx.utils_hp import Alm, almxfl
+from lenspyx import cachers
+
+
+class unl_cmbs:
+    """Minimal unlensed CMB library, with alms reproducible from the simulation index in any process
+
+    """
+    fields = ['t', 'e', 'b', 'p']
+    def __init__(self, lmax:int):
+        self.lmax = lmax
+
+    def hashdict(self):
+        return {'lmax': self.lmax}
+
+    def _get_alm(self, idx, field):
+        lmax = self.lmax
+        rng = np.random.default_rng(len(self.fields) * idx + self.fields.index(field))
+        nalm = Alm.getsize(lmax, lmax)
+        alm = rng.standard_normal(nalm) + 1j * rng.standard_normal(nalm)
+        alm[:lmax + 1] = np.sqrt(2.) * alm[:lmax + 1].real
+        cl = cls_unl[{'t':'tt', 'e':'ee', 'b':'bb', 'p':'pp'}[field]][:lmax + 1]
+        return almxfl(alm, np.sqrt(0.5 * cl), lmax, False)
+
+    def get_sim_tlm(self, idx):
+        return self._get_alm(idx, 't')
+
+    def get_sim_elm(self, idx):
+        return self._get_alm(idx, 'e')
+
+    def get_sim_blm(self, idx):
+        return self._get_alm(idx, 'b')
+
+    def get_sim_plm(self, idx):
+        return self._get_alm(idx, 'p')
+
+
+def get_sims(cache=None, **kwargs):
+    lmax_len, dlmax = 64, 32
+    return sims.sims_cmb_len(lmax_len, unl_cmbs(lmax_len + dlmax), cache=cache, dlmax=dlmax, dlmax_gl=32,
+                             epsilon=1e-10, numthreads=1, **kwargs)
+
+
+if __name__ == '__main__': # (guarded for the process pool workers)
+    try:
+        from lenspyx import sims
+    except ImportError:
+        print('plancklens not installed, skipping')
+        sys.exit(0)
+
+    serial = get_sims()
+    refs = [(serial.get_sim_tlm(idx), serial.get_sim_eblm(idx)) for idx in range(2)]
+    # the deflection of the last index is kept, and then used for all its fields
+    assert list(serial._ffis.keys()) == [1]
+    f = serial._ffis[1]
+    serial.get_sim_tlm(1)
+    assert serial._get_f(1) is f
+    serial.invalidate(1)
+    assert len(serial._ffis) == 0
+    serial = get_sims(ffi_cache_size=2)
+    for idx, (tlm, eblm) in enumerate(refs):
+        tlm2, eblm2 = serial.get_sim_teblm(idx)
+        devs = [np.max(np.abs(tlm2 - tlm)) / np.max(np.abs(tlm)), np.max(np.abs(eblm2 - eblm)) / np.max(np.abs(eblm))]
+        print('sim %s, get_sim_teblm vs get_sim_tlm, get_sim_eblm max. rel. devs.: %.2e %.2e'%(idx, *devs))
+        assert np.max(devs) < 1e-12, devs
+    assert list(serial._ffis.keys()) == [0, 1]
+    serial.invalidate(0)
+    assert list(serial._ffis.keys()) == [1]
+    serial.invalidate()
+    assert len(serial._ffis) == 0
+    serial = get_sims(ffi_cache_size=0) # nothing kept
+    serial.get_sim_tlm(0)
+    assert len(serial._ffis) == 0
+
+    with tempfile.TemporaryDirectory() as lib_dir:
+        par = get_sims(cache=cachers.cacher_npy(lib_dir))
+        par.generate_range(0, 2, nworkers=2)
+        assert len(par._ffis) == 0 # all done in the workers
+        for idx, (tlm, eblm) in enumerate(refs):
+            assert par.cacher.is_cached('sim_%04d_tlm'%idx) and par.cacher.is_cached('sim_%04d_eblm'%idx)
+            devs = [np.max(np.abs(par.cacher.load(fn) - ref)) / np.max(np.abs(ref))
+                    for fn, ref in zip(['sim_%04d_tlm'%idx, 'sim_%04d_eblm'%idx], [tlm, eblm])]
+            print('sim %s, parallel vs serial max. rel. devs.: %.2e %.2e'%(idx, *devs))
+            assert np.max(devs) < 1e-12, devs
@@ -0,0 +1,47 @@
+"""Tests batched lensing of several fields sharing the same deflection pointing
+
+"""
+import numpy as np
+from lenspyx.tests.helper import syn_alms, syn_ffi, duccd28
+from lenspyx.remapping.deflection_028 import dfsgrid
+
+lmax = 200
+tlm = syn_alms(0, lmax)
+eblm = syn_alms(2, lmax)
+ffi, geom = syn_ffi(lmax, 100, engine=duccd28)
+T = ffi.gclm2lenmap(tlm, None, 0, False)
+Q, U = ffi.gclm2lenmap(eblm, None, 2, False)
+Qg, Ug = ffi.gclm2lenmap(eblm[0:1], None, 2, False)
+T2, (Q2, U2), (Qg2, Ug2) = ffi.gclm2lenmap_many([tlm, eblm, eblm[0:1]], None, [0, 2, 2])
+print('All numbers should be zero')
+maxdiff = 0.
+for a, b in zip([T, Q, U, Qg, Ug], [T2, Q2, U2, Qg2, Ug2]):
+    diff = np.max(np.abs(a - b)) / np.std(a)
+    print(diff)
+    maxdiff = max(maxdiff, diff)
+assert maxdiff < 1e-13, maxdiff
+
+# One field, several deflections, sharing the double Fourier sphere grid of the field
+maxdiff = 0.
+for planned in [False, True]:
+    ffis = [syn_ffi(lmax, geom=geom, dlm=ffi.dlm, engine=duccd28, planned=planned)[0],
+            syn_ffi(lmax, geom=geom, dlm=0.5 * ffi.dlm, engine=duccd28, planned=planned)[0]]
+    for gclm, spin in zip([tlm, eblm], [0, 2]):
+        dfs = dfsgrid(gclm, None, spin)
+        for f in ffis:
+            ref = f.gclm2lenmap(gclm, None, spin, False)
+            diff = np.max(np.abs(f.dfs2lenmap(dfs) - ref)) / np.std(ref)
+            print('dfs2lenmap, planned %s, spin %s: %.2e'%(planned, spin, diff))
+            maxdiff = max(maxdiff, diff)
+assert maxdiff < 1e-10, maxdiff
+
+# Pipelined lensing of several fields
+maxdiff = 0.
+for backwards in [False, True]:
+    refs = [ffi.lensgclm(gclm, None, spin, lmax, None, backwards=backwards) for gclm, spin in zip([tlm, eblm], [0, 2])]
+    rets = ffi.lensgclm_many([tlm, eblm], None, [0, 2], lmax, None, backwards=backwards)
+    for ref, ret in zip(refs, rets):
+        diff = np.max(np.abs(ret - ref)) / np.max(np.abs(ref))
+        print('lensgclm_many, backwards %s: %.2e'%(backwards, diff))
+        maxdiff = max(maxdiff, diff)
+assert maxdiff < 1e-13, maxdiff
@@ -0,0 +1,31 @@
+"""Tests the chunked detector-pointing lensing against the deflected maps
+
+"""
+import numpy as np
+from lenspyx.tests.helper import syn_alms, syn_ffi
+
+lmax = 128
+ffi, geom = syn_ffi(lmax, dclm_fac=0.3)
+npix = geom.npix()
+tht, phi = geom.pix2ang(np.arange(npix))
+psi = np.random.default_rng(0).uniform(0., 2 * np.pi, npix)
+chunk = 10000
+for spin in [0, 2]:
+    gclm = np.atleast_2d(syn_alms(spin, lmax))
+    lenmap = ffi.gclm2lenmap(gclm, None, spin, False)
+    chunks = ((tht[i:i + chunk], phi[i:i + chunk], psi[i:i + chunk]) for i in range(0, npix, chunk))
+    tod = np.concatenate(list(ffi.gclm2lentod(gclm, None, spin, chunks)))
+    ref = lenmap if spin == 0 else lenmap[0] * np.cos(spin * psi) + lenmap[1] * np.sin(spin * psi)
+    dev = np.max(np.abs(tod - ref)) / np.max(np.abs(ref))
+    print('spin %s: max. rel. dev. %.2e'%(spin, dev))
+    assert dev < 1e-8, dev
+
+# single precision deflection
+ffi32 = syn_ffi(lmax, geom=geom, dlm=ffi.dlm.astype(np.complex64), dclm=ffi.dclm.astype(np.complex64), epsilon=1e-6)[0]
+gclm = np.atleast_2d(syn_alms(0, lmax))
+chunks = ((tht[i:i + chunk], phi[i:i + chunk]) for i in range(0, npix, chunk))
+tod = np.concatenate(list(ffi32.gclm2lentod(gclm, None, 0, chunks)))
+ref = np.atleast_2d(ffi.gclm2lenmap(gclm, None, 0, False))[0]
+dev = np.max(np.abs(tod - ref)) / np.max(np.abs(ref))
+print('complex64 deflection, spin 0: max. rel. dev. %.2e'%dev)
+assert dev < 1e-5, dev
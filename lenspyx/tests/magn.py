@@ -0,0 +1,30 @@
+"""Tests the magnification determinant: caching, band-wise calculation and numpy fallback
+
+"""
+import numpy as np
+from lenspyx.tests.helper import syn_ffi
+from lenspyx.remapping import deflection_028
+
+lmax = 128
+for dclm_fac in [0., 0.3]:
+    ffi, geom = syn_ffi(lmax, dclm_fac=dclm_fac)
+    A = ffi.dlm2A()
+    assert ffi.cacher.is_cached('magn') and np.all(ffi.dlm2A() == A)
+    # the deflection maps the sphere onto itself, the determinant integrates to the sphere area
+    area = np.sum(geom.apply_weights(A.copy())) / (4 * np.pi)
+    print('curl %s: integral of A / 4pi - 1: %.2e'%(dclm_fac, area - 1))
+    assert np.abs(area - 1) < 1e-9, area
+    # band by band, on compact band maps
+    for band in ffi.get_bands(3):
+        pix = geom.ang2pix(*band.pix2ang(np.arange(band.npix())))
+        assert np.max(np.abs(ffi.dlm2A(band) - A[pix])) < 1e-12
+    # numpy fallback
+    if deflection_028.HAS_NUMEXPR:
+        deflection_028.HAS_NUMEXPR = False
+        try:
+            A_np = ffi._dlm2A(geom, chunk_size=10000)
+        finally:
+            deflection_028.HAS_NUMEXPR = True
+        dev = np.max(np.abs(A_np - A))
+        print('curl %s: numpy vs numexpr max. dev. %.2e'%(dclm_fac, dev))
+        assert dev < 1e-12, dev
@@ -0,0 +1,54 @@
+"""Tests that lensing with memory-budget plans gives the same results as without budget
+
+"""
+import numpy as np
+from lenspyx.tests.helper import syn_alms, syn_ffi
+
+lmax = 128
+ffi, geom = syn_ffi(lmax)
+
+def get_ffi(max_memory=None):
+    return syn_ffi(lmax, geom=geom, dlm=ffi.dlm, max_memory=max_memory)[0]
+
+peak = ffi.memory_estimate(lmax, 2)['peak']
+for spin in [0, 2]:
+    gclm = np.atleast_2d(syn_alms(spin, lmax))
+    refs = [ffi.lensgclm(gclm, None, spin, lmax, None, backwards=bwd, nomagn=bwd) for bwd in [False, True]]
+    for fac in [0.97, 0.6]:
+        ffi_mem = get_ffi(fac * peak)
+        assert ffi_mem.mem_plan['peak'] <= fac * peak
+        for bwd, ref in zip([False, True], refs):
+            ret = ffi_mem.lensgclm(gclm, None, spin, lmax, None, backwards=bwd, nomagn=bwd)
+            dev = np.max(np.abs(ret - ref)) / np.max(np.abs(ref))
+            print('spin %s, %s bands, bwd %s: max. rel. dev. %.2e'%(spin, ffi_mem.nbands, bwd, dev))
+            assert dev < 1e-8, dev
+
+# the batch methods follow the banded plan, without building the full pointing
+ffi_mem = get_ffi(0.6 * peak)
+assert ffi_mem.nbands > 1, ffi_mem.mem_plan
+tlm, eblm = np.atleast_2d(syn_alms(0, lmax)), np.atleast_2d(syn_alms(2, lmax))
+for bwd in [False, True]:
+    rets = ffi_mem.lensgclm_many([tlm, eblm], None, [0, 2], lmax, None, backwards=bwd)
+    for ret, gclm, spin in zip(rets, [tlm, eblm], [0, 2]):
+        ref = ffi.lensgclm(gclm, None, spin, lmax, None, backwards=bwd)
+        dev = np.max(np.abs(ret - ref)) / np.max(np.abs(ref))
+        print('lensgclm_many, spin %s, %s bands, bwd %s: max. rel. dev. %.2e'%(spin, ffi_mem.nbands, bwd, dev))
+        assert dev < 1e-8, dev
+assert not ffi_mem.cacher.is_cached('ptg')
+refused = False
+try:
+    ffi_mem.gclm2lenmap_many([tlm, eblm], None, [0, 2])
+except AssertionError:
+    refused = True
+assert refused and not ffi_mem.cacher.is_cached('ptg')
+
+# engines without streamed lensing do not get the latitude bands option
+from lenspyx.remapping import deflection_028
+assert not deflection_028.deflection._supports_streaming and ffi._supports_streaming
+ffi_028 = syn_ffi(lmax, geom=geom, dlm=ffi.dlm, engine=deflection_028.deflection)[0]
+refused = False
+try:
+    ffi_028.plan_memory(0.6 * peak)
+except AssertionError as e:
+    refused = 'latitude bands' in str(e)
+assert refused
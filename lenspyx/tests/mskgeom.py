@@ -0,0 +1,33 @@
+"""Tests the mask-driven sparse geometry against transforms on the parent geometry
+
+"""
+import numpy as np
+from lenspyx.remapping.utils_geom import Geom, mskGeometry
+from lenspyx.utils_hp import synalm
+
+lmax = 256
+rng = np.random.default_rng(1)
+for geom in [Geom.get_thingauss_geometry(lmax, 2), Geom.get_healpix_geometry(128)]:
+    tht, phi = geom.pix2ang(np.arange(geom.npix()))
+    # patch across phi = 0, with holes
+    mask = (tht < 1.2) & (tht > 0.4) & ((phi < 0.7) | (phi > 2 * np.pi - 0.5))
+    mask &= rng.random(mask.size) > 0.1
+    mg = mskGeometry(geom, mask)
+    assert np.unique(mg.pix).size == mg.npix()
+    assert np.all(np.isin(np.flatnonzero(mask), mg.pix))
+    assert np.all(mg.pbound.contains(phi[mask])), mg.pbound
+    for pb, n, o in zip(mg.pbounds, mg.nph, mg.ofs):
+        assert np.all(pb.contains(phi[mg.pix[o:o + n]]))
+    print('sparse map: %s pixels, parent: %s pixels, rings: %s pixels'%(mg.npix(), geom.npix(), mg.rgeom.npix()))
+    for spin in [0, 2]:
+        alm = np.array([synalm(np.ones(lmax + 1), lmax, lmax) for i in range(1 + (spin > 0))])
+        m = geom.synthesis(alm, spin, lmax, lmax, 1)
+        dev = np.max(np.abs(mg.synthesis(alm, spin, lmax, lmax, 1) - mg.from_parent(m)))
+        print('spin %s synthesis max. dev. %.2e'%(spin, dev))
+        assert dev < 1e-12, dev
+        m *= mask
+        assert np.all(mg.to_parent(mg.from_parent(m)) == m)
+        ref = geom.adjoint_synthesis(m.copy(), spin, lmax, lmax, 1)
+        dev = np.max(np.abs(mg.adjoint_synthesis(mg.from_parent(m), spin, lmax, lmax, 1) - ref)) / np.max(np.abs(ref))
+        print('spin %s adjoint synthesis max. rel. dev. %.2e'%(spin, dev))
+        assert dev < 1e-12, dev
@@ -0,0 +1,38 @@
+"""Tests the memory-mapped loads and atomic writes of cacher_npy, and lensing with the pointing on read-only memmaps
+
+"""
+import os
+import tempfile
+import numpy as np
+from lenspyx.tests.helper import syn_alms, syn_ffi
+from lenspyx import cachers
+
+with tempfile.TemporaryDirectory() as lib_dir:
+    store = cachers.cacher_npy(lib_dir, mmap=True)
+    arr = np.random.default_rng(0).standard_normal((1000, 2))
+    store.cache('arr', arr)
+    assert os.listdir(lib_dir) == ['arr.npy'], os.listdir(lib_dir) # no temporary file left over
+    loaded = store.load('arr')
+    assert isinstance(loaded, np.memmap) and not loaded.flags.writeable
+    assert np.all(loaded == arr)
+    # overwriting replaces the file atomically: existing maps keep pointing to the previous array
+    store.cache('arr', 2 * arr)
+    assert np.all(loaded == arr) and np.all(store.load('arr') == 2 * arr)
+    assert os.listdir(lib_dir) == ['arr.npy'], os.listdir(lib_dir)
+    store.remove('arr')
+
+    lmax = 128
+    ffi, geom = syn_ffi(lmax)
+    ffi_disk = syn_ffi(lmax, geom=geom, dlm=ffi.dlm, cacher=cachers.cacher_npy(lib_dir, mmap=True))[0]
+    ffi_disk._get_ptg()
+    # the second instance finds the pointing on disk, and reads it through memmaps
+    ffi_mmap = syn_ffi(lmax, geom=geom, dlm=ffi.dlm, cacher=cachers.cacher_npy(lib_dir, mmap=True))[0]
+    assert isinstance(ffi_mmap._get_ptg(), np.memmap)
+    for spin in [0, 2]:
+        gclm = np.atleast_2d(syn_alms(spin, lmax))
+        for bwd in [False, True]:
+            ref = ffi.lensgclm(gclm, None, spin, lmax, None, backwards=bwd)
+            ret = ffi_mmap.lensgclm(gclm, None, spin, lmax, None, backwards=bwd)
+            dev = np.max(np.abs(ret - ref)) / np.max(np.abs(ref))
+            print('spin %s, bwd %s: max. rel. dev. %.2e'%(spin, bwd, dev))
+            assert dev < 1e-12, dev
@@ -0,0 +1,24 @@
+"""Tests the pixel to ring, pixel to angle and angle to pixel lookups on a few geometries
+
+"""
+import numpy as np
+from lenspyx.remapping.utils_geom import Geom
+
+rng = np.random.default_rng(42)
+for geom in [Geom.get_thingauss_geometry(300, 2), Geom.get_healpix_geometry(64), Geom.get_cc_geometry(100, 50)]:
+    rings = np.arange(geom.theta.size)
+    pix = Geom.rings2pix(geom, rings)
+    assert np.all(np.sort(pix) == np.arange(geom.npix()))
+    assert np.all(geom.pix2ring(pix) == np.repeat(rings, geom.nph.astype(int)))
+    tht, phi = geom.pix2ang(pix)
+    assert np.all(tht == np.repeat(geom.theta, geom.nph.astype(int)))
+    assert np.max(np.abs(phi - Geom.rings2phi(geom, rings))) < 1e-14
+    # perturbed directions must point back to the same pixels
+    q = rng.integers(0, geom.npix(), 100000)
+    tht, phi = geom.pix2ang(q)
+    assert np.all(geom.ang2pix(tht + 1e-8, phi - 1e-8) == q)
+    # pixels of a sub-geometry referring to the parent map
+    sub = geom.restrict(0., np.pi / 4, False)
+    inside = np.isin(pix, Geom.rings2pix(sub, np.arange(sub.theta.size)))
+    assert np.all((sub.pix2ring(pix) >= 0) == inside)
+    print('ok', geom.npix())
@@ -0,0 +1,45 @@
+"""Tests the memory-bounded cache of nuFFT plans: hits, misses, eviction and sharing across deflection instances
+
+"""
+import numpy as np
+from lenspyx.tests.helper import syn_alms, syn_ffi, duccd28
+from lenspyx import cachers
+
+lmax = 128
+ffi, geom = syn_ffi(lmax, engine=duccd28, planned=True)
+ref, geom = syn_ffi(lmax, geom=geom, dlm=ffi.dlm, engine=duccd28)
+pc = ffi.plan_cache
+gclm = np.atleast_2d(syn_alms(2, lmax))
+lenmap = ffi.gclm2lenmap(gclm, None, 2, False)
+assert pc.stats()['misses'] == 1 and pc.stats()['hits'] == 0, pc.stats()
+ffi.gclm2lenmap(gclm, None, 2, False)
+ffi.lenmap2gclm(lenmap.copy(), 2, lmax, lmax)
+assert pc.stats()['misses'] == 1 and pc.stats()['hits'] == 2, pc.stats()
+dev = np.max(np.abs(lenmap - ref.gclm2lenmap(gclm, None, 2, False))) / np.max(np.abs(lenmap))
+print('planned vs unplanned max. rel. dev. %.2e'%dev)
+assert dev < 1e-8, dev
+
+# change_dlm shares the cache: new deflection field, new plan; identical deflection field, same plan
+ffi2 = ffi.change_dlm([0.5 * ffi.dlm, None], None)
+assert ffi2.plan_cache is pc
+ffi2.gclm2lenmap(gclm, None, 2, False)
+assert pc.stats()['misses'] == 2 and pc.stats()['size'] == 2, pc.stats()
+ffi3 = ffi.change_dlm([ffi.dlm, None], None)
+ffi3.gclm2lenmap(gclm, None, 2, False)
+assert pc.stats()['misses'] == 2 and pc.stats()['hits'] == 3, pc.stats()
+
+# memory budget for a single plan: the least recently used plan is evicted
+pc.max_memory = pc.memory() // 2 + 1
+ffi2.gclm2lenmap(gclm, None, 2, False) # hit, ffi2 plan is now the most recent one
+ffi4 = ffi.change_dlm([0.25 * ffi.dlm, None], None)
+ffi4.gclm2lenmap(gclm, None, 2, False)
+assert pc.stats()['evictions'] == 2 and pc.stats()['size'] == 1, pc.stats()
+ffi.gclm2lenmap(gclm, None, 2, False) # evicted, rebuilt
+assert pc.stats()['misses'] == 4 and pc.memory() <= pc.max_memory, pc.stats()
+print(pc.stats())
+
+# bare cache
+pc = cachers.plan_cache(max_memory=10)
+assert pc.get('a', lambda: 1, 4) == 1 and pc.get('b', lambda: 2, 4) == 2 and pc.get('a', lambda: 3, 4) == 1
+assert pc.get('c', lambda: 4, 4) == 4 and pc.stats()['evictions'] == 1 and pc.get('b', lambda: 5, 4) == 5
+assert pc.get('big', lambda: 6, 20) == 6 and pc.stats()['size'] == 1 # kept, even alone above budget
@@ -0,0 +1,44 @@
+"""Tests that deflection instances with identical inputs share the pointing through a persistent cache
+
+"""
+import os
+import tempfile
+import numpy as np
+from lenspyx.tests.helper import syn_alms, syn_dlm
+from lenspyx.remapping import utils_geom
+from lenspyx.remapping.deflection_029 import deflection
+from lenspyx import cachers
+
+lmax = 128
+dlm = syn_dlm(lmax)
+geom = utils_geom.Geom.get_thingauss_geometry(lmax + 64, 2)
+gclm = np.atleast_2d(syn_alms(2, lmax)).astype(np.complex64)
+with tempfile.TemporaryDirectory() as lib_dir:
+    store = cachers.cacher_lru(lib_dir, max_size=20 * 1024 ** 2)
+    ffi = deflection(geom, dlm, None, ptg_cache=store)
+    lenmap = ffi.gclm2lenmap(gclm, None, 2, False)
+    ffi2 = deflection(utils_geom.Geom.get_thingauss_geometry(lmax + 64, 2), dlm.copy(), None, ptg_cache=store)
+    assert ffi2.ptg_hash() == ffi.ptg_hash()
+    assert ffi2.cacher.is_cached('ptg') and ffi2.cacher.is_cached('gamma')
+    assert np.all(ffi2.gclm2lenmap(gclm, None, 2, False) == lenmap)
+    ffi3 = deflection(geom, 1.01 * dlm, None, ptg_cache=store)
+    assert not ffi3.cacher.is_cached('ptg')
+    # size bound: the least recently used arrays are removed
+    store.max_size = 1.5 * sum([os.path.getsize(os.path.join(lib_dir, fn)) for fn in os.listdir(lib_dir)])
+    ffi3.gclm2lenmap(gclm, None, 2, False)
+    assert not ffi.cacher.is_cached('ptg') and ffi3.cacher.is_cached('ptg') and ffi3.cacher.is_cached('gamma')
+    print(sorted(os.listdir(lib_dir)))
+    # the user cacher and the shared store cannot be mixed
+    refused = False
+    try:
+        deflection(geom, dlm, None, cacher=cachers.cacher_mem(safe=False), ptg_cache=store)
+    except AssertionError:
+        refused = True
+    assert refused
+    assert ffi.change_dlm([dlm, None], None, cacher=cachers.cacher_mem(safe=False)).ptg_cache is None
+    # the iterated pointing of the inverse deflection stays out of the store
+    store.max_size = 20 * 1024 ** 2
+    ffi_inv = ffi.inverse(niter_max=2)
+    assert ffi_inv.ptg_cache is None and ffi_inv.cacher.is_cached('ptg')
+    ffi_inv2 = deflection(geom, ffi_inv.dlm, None, dclm=ffi_inv.dclm, ptg_cache=store)
+    assert not ffi_inv2.cacher.is_cached('ptg') and not ffi_inv2.cacher.is_cached('gamma')
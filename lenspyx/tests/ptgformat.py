@@ -0,0 +1,23 @@
+"""Tests lensing with the single precision pointing offsets against the double precision absolute angles
+
+"""
+import numpy as np
+from lenspyx.tests.helper import syn_alms, syn_ffi
+from lenspyx.remapping.deflection_028 import offset32_epsilon_min
+
+lmax = 256
+ffi, geom = syn_ffi(lmax)
+for spin in [0, 2]:
+    gclm = np.atleast_2d(syn_alms(spin, lmax))
+    ref = ffi.gclm2lenmap(gclm, None, spin, False)
+    for epsilon in [1e-5, offset32_epsilon_min]:
+        ffis = [syn_ffi(lmax, geom=geom, dlm=ffi.dlm, epsilon=epsilon, ptg_format=fmt)[0] for fmt in ['abs64', 'offset32']]
+        maps = [f.gclm2lenmap(gclm, None, spin, False) for f in ffis]
+        assert ffis[1].cacher.is_cached('dptg') and not ffis[1].cacher.is_cached('ptg')
+        devs = [np.max(np.abs(m - ref)) / np.max(np.abs(ref)) for m in maps]
+        print('spin %s, epsilon %.0e: abs64 max. rel. dev. %.2e, offset32 %.2e'%(spin, epsilon, *devs))
+        assert devs[1] < epsilon and devs[1] < 2 * devs[0] + 1e-8, devs
+# below the floor, the pointing falls back to the double precision absolute angles
+ffi32 = syn_ffi(lmax, geom=geom, dlm=ffi.dlm, ptg_format='offset32')[0]
+assert ffi32.ptg_format == 'abs64'
+assert np.all(ffi32.gclm2lenmap(gclm, None, 2, False) == ref)
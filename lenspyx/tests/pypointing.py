@@ -0,0 +1,20 @@
+"""Tests the numpy implementation of the deflected angles against ducc's
+
+"""
+import numpy as np
+from lenspyx.tests.helper import syn_ffi
+from lenspyx.remapping import utils_geom
+
+lmax = 128
+ffi_tg, geom_tg = syn_ffi(lmax, dclm_fac=0.3)
+for geom in [geom_tg, utils_geom.Geom.get_healpix_geometry(64)]:
+    ffi = syn_ffi(lmax, geom=geom, dlm=ffi_tg.dlm, dclm=ffi_tg.dclm)[0]
+    d1 = ffi._build_d1()
+    ptg, gamma = ffi._deflected_angles(d1, geom)
+    ptg_py, gamma_py = ffi._python_angles(d1, geom)
+    cis_py = ffi._python_angles(d1, geom, cis=True)[1]
+    dphi = (ptg_py[:, 1] - ptg[:, 1] + np.pi) % (2 * np.pi) - np.pi
+    devs = [np.max(np.abs(ptg_py[:, 0] - ptg[:, 0])), np.max(np.abs(dphi * np.sin(ptg[:, 0]))),
+            np.max(np.abs(gamma_py - gamma)), np.max(np.abs(cis_py - np.exp(1j * gamma)))]
+    print('max. dev. tht %.2e, phi %.2e, gamma %.2e, cis %.2e'%tuple(devs))
+    assert np.max(devs) < 1e-12, devs
@@ -35,3 +35,54 @@ for gl in gl_base:
         print('This should be zero', diff)
         maxdiff = max(maxdiff, diff)
 assert maxdiff < 1e-13, maxdiff
+
+# The default split is the uniform co-latitude split, with exactly the requested number of bands
+for gl in gl_base:
+    for nbands in [2, 3, 5, 10]:
+        gls, gls_u = gl.split(nbands), gl.split(nbands, balance='uniform')
+        assert len(gls) == nbands
+        edges = np.linspace(0., np.pi * 0.5, nbands + 1)
+        for g, g_u, th_l, th_u in zip(gls, gls_u, edges[:-1], edges[1:]):
+            assert np.array_equal(g.theta, g_u.theta) and np.array_equal(g.ofs, g_u.ofs)
+            assert np.array_equal(g.theta, gl.restrict(th_l, th_u, True).theta)
+
+# Balanced splits: no overlap, and bands of similar sizes
+for gl in gl_base:
+    for balance in ['npix', 'sht']:
+        gls = gl.split(10, balance=balance)
+        assert np.sum([g.npix() for g in gls]) == gl.npix(), balance
+        costs = [np.sum(g.ring_costs(balance)) for g in gls]
+        print(balance, 'cost imbalance', np.max(costs) / np.mean(costs))
+        assert np.max(costs) < 1.2 * np.mean(costs), (balance, costs)
+    m, m2 = np.zeros((2, 1, gl.npix()), dtype=float)
+    gls = gl.split_for_workers(3, lmax=lmax)
+    assert np.sum([g.npix() for g in gls]) == gl.npix()
+    for g in gls:
+        g.synthesis(tlm, spin, lmax, lmax, nthreads, map=m)
+    gl.synthesis(tlm, spin, lmax, lmax, nthreads, map=m2)
+    diff = np.max(np.abs(m2 - m) / np.std(m2))
+    print('This should be zero', diff)
+    assert diff < 1e-13, diff
+
+# Adjoint synthesis on bands with ringstarts referring to the full map
+for gl in gl_base:
+    m = np.atleast_2d(gl.synthesis(tlm, spin, lmax, lmax, nthreads))
+    ref = gl.adjoint_synthesis(m.copy(), spin, lmax, lmax, nthreads)
+    for gls in [gl.split(4), gl.split_for_workers(3), [gl.restrict(0., 0.3, True), gl.restrict(0.3, np.pi * 0.5, True)]]:
+        tlm_bands = np.sum([g.adjoint_synthesis(m.copy(), spin, lmax, lmax, nthreads) for g in gls], axis=0)
+        diff = np.max(np.abs(tlm_bands - ref)) / np.max(np.abs(ref))
+        print('adjoint synthesis, this should be zero', diff)
+        assert diff < 1e-13, diff
+
+# Weighting of bands with gaps in the map, in place or into a buffer, against the ring loop
+for gl in gl_base:
+    band = gl.restrict(0.3, np.pi * 0.5, True)
+    m = np.random.standard_normal((2, gl.npix()))
+    ref = m.copy()
+    for of, w, npi in zip(band.ofs, band.weight, band.nph):
+        ref[:, of:of + npi] *= w
+    for nt, chunk_size in [(1, 2 ** 18), (3, 1000), (3, 1)]:
+        buf = np.full_like(m, np.nan)
+        assert np.array_equal(band.apply_weights(m, nt, out=buf, chunk_size=chunk_size), ref)
+        assert np.array_equal(band.apply_weights(m.copy(), nt, chunk_size=chunk_size), ref)
+    assert not np.array_equal(m, ref) # the input map is left untouched with an output buffer